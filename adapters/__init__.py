@@ -19,3 +19,16 @@ def get_adapter(name: str):
     if name not in ADAPTERS:
         raise ValueError(f"Unknown exchange adapter: {name}")
     return ADAPTERS[name]
+
+def _warmup(rounds: int = 16):
+    """
+    Push a sample allLiquidation frame through the Bybit parse path a few
+    times at import, so CPython 3.11+ has specialized its bytecode (dict
+    lookups, attribute loads) before the first live burst arrives.
+    """
+    sample = b'{"topic":"allLiquidation.BTCUSDT","ts":1,"data":[{"T":1,"s":"BTCUSDT","S":"Buy","v":"1","p":"1"}]}'
+    adapter = BybitAdapter(writer=None, market="usdt")
+    for _ in range(rounds):
+        adapter._parse_frame(sample)
+
+_warmup()
@@ -0,0 +1,55 @@
+# adapters/_shared.py
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# One parse pool for every adapter in the process. Each adapter keeps at most
+# one frame in flight, so a handful of workers covers the full --all set
+# without a thread pool per stream.
+PARSE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=min(8, os.cpu_count() or 1),
+    thread_name_prefix="liq-parse",
+)
+
+# Reconnect delays (seconds): 1.0, 1.8, 3.24, ... capped at 30. Index with
+# min(retry, len - 1) so a long outage stays at the cap.
+RECONNECT_BACKOFFS = tuple(min(30.0, 1.8 ** i) for i in range(10))
+
+
+def reconnect_delay(retry: int) -> float:
+    return RECONNECT_BACKOFFS[min(retry, len(RECONNECT_BACKOFFS) - 1)]
+
+
+# Backpressure: while the writer reports its Postgres buffers past their
+# high-water mark, a producer stops reading (the websocket's bounded queue,
+# then TCP, hold the frames) instead of piling rows into a full buffer. The
+# pause is capped so a Postgres outage can't stall the stream; after that the
+# writer's overflow policy decides which rows Postgres loses.
+BACKPRESSURE_POLL = 0.05
+BACKPRESSURE_MAX_WAIT = 1.0
+
+
+async def wait_writable(writer) -> None:
+    deadline = time.monotonic() + BACKPRESSURE_MAX_WAIT
+    while writer.is_backpressured() and time.monotonic() < deadline:
+        await asyncio.sleep(BACKPRESSURE_POLL)
+
+
+# Symbols repeat forever (a few hundred per venue), but every parsed frame
+# hands us a fresh str for each one. Map them to one interned copy so rows
+# share the object and downstream dict/compare hits are pointer-equal. The
+# cap only guards against a feed that sends junk symbols.
+_SYMBOLS: dict = {}
+_SYMBOLS_MAX = 8192
+
+
+def intern_symbol(s: str) -> str:
+    r = _SYMBOLS.get(s)
+    if r is None:
+        if len(_SYMBOLS) >= _SYMBOLS_MAX:
+            _SYMBOLS.clear()
+        r = _SYMBOLS.setdefault(s, sys.intern(s))
+    return r
@@ -2,25 +2,45 @@
 
 import asyncio
 import json
+import logging
 import time
 from typing import Any, Dict, List, Optional
 
 import websockets
 
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json works the same, just slower
+    orjson = None
+
+from schema import LiqRow
+from ._shared import PARSE_EXECUTOR, intern_symbol, reconnect_delay, wait_writable
+
+log = logging.getLogger(__name__)
+
 USDTM_WSS = "wss://fstream.binance.com/ws/!forceOrder@arr"
 COINM_WSS = "wss://dstream.binance.com/ws/!forceOrder@arr"
 
+if orjson is not None:
+    _loads = orjson.loads
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+else:
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
 def _now_ms() -> int:
-    return int(time.time() * 1000)
+    return time.time_ns() // 1_000_000
 
-def _derive_liq_side(order_side: Optional[str]) -> Optional[str]:
-    # Binance: BUY = forced buy to close SHORT; SELL = forced sell to close LONG
-    s = (order_side or "").upper()
-    if s == "BUY":
-        return "short"
-    if s == "SELL":
-        return "long"
-    return None
+# order side -> liquidated side; carries every casing the feeds use so the hot
+# path is a single dict lookup with no .upper()/.lower() allocation
+_SIDE_MAP = {
+    "BUY": "short", "Buy": "short", "buy": "short",
+    "SELL": "long", "Sell": "long", "sell": "long",
+}
 
 def _market_label(market: str) -> str:
     m = (market or "").lower()
@@ -30,6 +50,45 @@ def _market_label(market: str) -> str:
         return "coin"
     raise ValueError(f"Unknown Binance market: {market}")
 
+def _normalize_event(ev: Dict[str, Any], exchange: str, market: str,
+                     ts_ingest: int, raw: Optional[str]) -> Optional[LiqRow]:
+    """
+    Normalize one forceOrder event (field preferences are documented on
+    BinanceAdapter._normalize_batch). Module-level and free of `self`
+    lookups: this is the per-event kernel, and the one place a compiled
+    implementation would slot in. `raw` is the event's JSON text when the
+    caller already has it; otherwise the event is serialized here.
+    """
+    o = ev.get("o") or {}
+    if not o:
+        return None
+    get = o.get  # bound once; this is the per-event inner loop
+
+    t = ev.get("E")
+    if t is None:
+        t = get("T")
+    event_ms = int(t) if t is not None else None
+
+    price = float(get("ap") or get("p") or 0.0)
+    qty   = float(get("l") or get("z") or get("q") or 0.0)
+    symbol = intern_symbol(get("s", ""))
+    # BUY = forced buy to close SHORT; SELL = forced sell to close LONG
+    liq_side = _SIDE_MAP.get(get("S"))
+    notional = price * qty
+
+    return LiqRow(
+        exchange=exchange,
+        market=market,             # "usdt" or "coin"
+        symbol=symbol,
+        side=liq_side,             # "long" or "short" (positions liquidated)
+        qty=qty,
+        price=price,
+        notional=notional,
+        ts_exch_ms=event_ms,
+        ts_ingest_ms=ts_ingest,
+        raw=raw if raw is not None else _dumps(ev),
+    )
+
 class BinanceAdapter:
     EXCHANGE = "binance"
 
@@ -38,7 +97,7 @@ class BinanceAdapter:
         self.market = _market_label(market)
         self.ws_url = USDTM_WSS if self.market == "usdt" else COINM_WSS
 
-    def _normalize_and_write_batch(self, payload: Any):
+    def _normalize_batch(self, payload: Any, raw_frame: Any = None) -> List[LiqRow]:
         """
         Binance !forceOrder@arr pushes an array of events. Each event looks like:
         {
@@ -56,74 +115,73 @@ class BinanceAdapter:
           - symbol: o["s"]
           - order side: o["S"] => map to liq_side (long/short liquidated)
         """
+        rows: List[LiqRow] = []
         ts_ingest = _now_ms()
         events: List[Dict[str, Any]] = payload if isinstance(payload, list) else [payload]
+
+        # A frame carrying exactly one event already is that event's JSON;
+        # reuse it for `raw` instead of serializing the parsed dict again.
+        frame_raw = None
+        if raw_frame is not None and len(events) == 1:
+            frame_raw = raw_frame if isinstance(raw_frame, str) else raw_frame.decode("utf-8", "replace")
+            if isinstance(payload, list):
+                frame_raw = frame_raw.strip()[1:-1]  # "[{...}]" -> "{...}"
+
         for ev in events:
             try:
-                o = ev.get("o") or {}
-                if not o:
-                    continue
-
-                event_ms = None
-                if ev.get("E") is not None:
-                    event_ms = int(ev["E"])
-                elif o.get("T") is not None:
-                    event_ms = int(o["T"])
-
-                price = float(o.get("ap") or o.get("p") or 0.0)
-                qty   = float(o.get("l") or o.get("z") or o.get("q") or 0.0)
-                symbol = o.get("s", "")
-                order_side = o.get("S")  # BUY/SELL
-                liq_side = _derive_liq_side(order_side)
-                notional = price * qty if price and qty else None
-
-                out = {
-                    "exchange": self.EXCHANGE,
-                    "market": self.market,      # "usdt" or "coin"
-                    "symbol": symbol,
-                    "side": liq_side,           # "long" or "short" (positions liquidated)
-                    "qty": qty,
-                    "price": price,
-                    "notional": notional,
-                    "ts_exch_ms": event_ms,
-                    "ts_ingest_ms": ts_ingest,
-                    "raw": json.dumps(ev, separators=(",", ":"))
-                }
-                self.writer.write_row(out)
+                out = _normalize_event(ev, self.EXCHANGE, self.market, ts_ingest, frame_raw)
+                if out is not None:
+                    rows.append(out)
             except Exception as e:
-                print(f"[binance] Error normalizing event: {e}")
+                log.error("[binance] Error normalizing event: %s", e)
+        return rows
+
+    def _parse_frame(self, msg: Any) -> List[LiqRow]:
+        """Parse + normalize one frame. Runs on the parse executor thread."""
+        try:
+            data = _loads(msg)
+        except ValueError:
+            # ignore keepalives or unexpected frames (JSONDecodeError from
+            # either parser, or invalid UTF-8 in a binary frame)
+            return []
+        return self._normalize_batch(data, msg)
 
     async def run(self):
-        print(f"[binance] Connecting {self.ws_url} (market={self.market})")
-        backoff = 1.0
+        log.info("[binance] Connecting %s (market=%s)", self.ws_url, self.market)
+        loop = asyncio.get_running_loop()
+        retry = 0
         while True:
             try:
                 async with websockets.connect(
                     self.ws_url,
                     ping_interval=20,
                     ping_timeout=10,
-                    max_size=10_000_000
+                    max_size=10_000_000,
+                    max_queue=64,       # bounded receive buffer during bursts
+                    compression=None,   # small JSON frames; skip per-frame inflate
                 ) as ws:
-                    print("[binance] Connected.")
-                    backoff = 1.0  # reset on success
+                    log.info("[binance] Connected.")
+                    retry = 0  # reset on success
 
                     async for msg in ws:
                         try:
-                            if isinstance(msg, bytes):
-                                msg = msg.decode("utf-8", "ignore")
-                            if msg == "ping":
+                            # text frames arrive as str, binary as bytes; both parse as-is
+                            if msg == "ping" or msg == b"ping":
                                 await ws.send("pong")
                                 continue
-                            data = json.loads(msg)
-                            self._normalize_and_write_batch(data)
-                        except json.JSONDecodeError:
-                            # ignore keepalives or unexpected frames
-                            continue
+                            # websockets keeps reading into its own queue while we
+                            # wait, and awaiting each frame keeps rows in order.
+                            rows = await loop.run_in_executor(PARSE_EXECUTOR, self._parse_frame, msg)
+                            if rows:
+                                self.writer.write_rows(rows)
+                                if self.writer.is_backpressured():
+                                    await wait_writable(self.writer)
                         except Exception as e:
-                            print(f"[binance] Frame error: {e}")
+                            log.error("[binance] Frame error: %s", e)
                             continue
             except Exception as e:
-                print(f"[binance] WS error: {e}. Reconnecting in {backoff:.1f}s...")
+                backoff = reconnect_delay(retry)
+                retry += 1
+                log.warning("[binance] WS error: %s. Reconnecting in %.1fs...", e, backoff)
                 await asyncio.sleep(backoff)
-                backoff = min(30.0, backoff * 1.8)
                 continue
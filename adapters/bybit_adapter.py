@@ -2,16 +2,79 @@
 import asyncio
 import json
 import logging
+import sys
 import time
-from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Any, List, Optional
 
+import aiohttp
 import websockets
-import requests
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json works the same, just slower
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional: typed decode of allLiquidation rows (dict path otherwise)
+    msgspec = None
+
+from schema import LiqRow
+from ._shared import PARSE_EXECUTOR, intern_symbol, reconnect_delay, wait_writable
+
+log = logging.getLogger(__name__)
+
+
+if orjson is not None:
+    _loads = orjson.loads
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+else:
+    _loads = json.loads
+
+    def _dumps(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"))
 
 
 def _now_ms() -> int:
-    return int(time.time() * 1000)
+    return time.time_ns() // 1_000_000
+
+
+# order side -> liquidated side; carries every casing the feeds use so the hot
+# path is a single dict lookup with no .upper()/.lower() allocation
+_SIDE_MAP = {
+    "BUY": "short", "Buy": "short", "buy": "short",
+    "SELL": "long", "Sell": "long", "sell": "long",
+}
+
+
+if msgspec is not None:
+    class _BybitLiq(msgspec.Struct):
+        """One liquidation row, either schema; numeric strings decode straight to numbers."""
+        T: Optional[int] = None             # allLiquidation
+        s: str = ""
+        S: str = ""
+        v: float = 0.0
+        p: float = 0.0
+        symbol: str = ""                    # legacy liquidation
+        side: str = ""
+        size: float = 0.0
+        price: float = 0.0
+        updatedTimeE6: Optional[int] = None
+
+    class _BybitFrame(msgspec.Struct):
+        topic: str = ""
+        ts: Optional[int] = None
+        data: Optional[msgspec.Raw] = None  # decoded lazily, per topic
+
+    # strict=False lets "20000"/"0.04499" decode into the float/int fields
+    _FRAME_DECODER = msgspec.json.Decoder(_BybitFrame)
+    _ROWS_DECODER = msgspec.json.Decoder(List[_BybitLiq], strict=False)
+    _RAW_ROWS_DECODER = msgspec.json.Decoder(List[msgspec.Raw])
+    _ROW_DECODER = msgspec.json.Decoder(_BybitLiq, strict=False)
+else:
+    _FRAME_DECODER = None
 
 
 def _to_float(x) -> float:
@@ -31,6 +94,9 @@ class BybitAdapter:
     You can opt into the legacy channel by passing use_all=False:
       - liquidation.<SYMBOL>
 
+    Pass emit_raw=False to leave `raw` empty when no sink needs it; this skips
+    one JSON serialization per liquidation.
+
     Market mapping:
       - market == "usdt"   -> linear  (wss://stream.bybit.com/v5/public/linear)
       - market in {"coin","coinm","inverse"} -> inverse (wss://stream.bybit.com/v5/public/inverse)
@@ -45,12 +111,15 @@ class BybitAdapter:
         symbols: Optional[List[str]] = None,
         subscribe_chunk: int = 100,
         use_all: bool = True,
+        emit_raw: bool = True,
     ):
         self.writer = writer
-        self.market = (market or "").lower()  # "usdt" or "coin"
+        # interned: lower() returns a fresh str, and every row carries this one
+        self.market = sys.intern((market or "").lower())  # "usdt" or "coin"
         self.symbols = symbols or []
         self.subscribe_chunk = max(1, int(subscribe_chunk))
         self.use_all = bool(use_all)
+        self.emit_raw = bool(emit_raw)
 
         if self.market == "usdt":
             self.ws_url = "wss://stream.bybit.com/v5/public/linear"
@@ -67,41 +136,43 @@ class BybitAdapter:
         if not self.symbols:
             self.symbols = await self._fetch_symbols()
         if not self.symbols:
-            logging.error(f"[bybit/{self.market}] No symbols discovered; exiting.")
+            log.error("[bybit/%s] No symbols discovered; exiting.", self.market)
             return
 
-        backoff = 1.0
+        loop = asyncio.get_running_loop()
+        retry = 0
         while True:
             try:
-                logging.info(f"[bybit/{self.market}] Connecting: {self.ws_url}")
+                log.info("[bybit/%s] Connecting: %s", self.market, self.ws_url)
                 async with websockets.connect(
-                    self.ws_url, ping_interval=20, ping_timeout=10, max_size=10_000_000
+                    self.ws_url, ping_interval=20, ping_timeout=10, max_size=10_000_000,
+                    max_queue=64, compression=None,
                 ) as ws:
-                    logging.info(
-                        f"[bybit/{self.market}] Connected. Subscribing to {len(self.symbols)} symbols "
-                        f"via {'allLiquidation' if self.use_all else 'liquidation'} (chunk={self.subscribe_chunk})."
+                    log.info(
+                        "[bybit/%s] Connected. Subscribing to %d symbols via %s (chunk=%d).",
+                        self.market, len(self.symbols),
+                        "allLiquidation" if self.use_all else "liquidation", self.subscribe_chunk,
                     )
                     await self._subscribe(ws, self.symbols)
 
                     # Reset backoff after a successful connect
-                    backoff = 1.0
+                    retry = 0
 
                     async for msg in ws:
-                        if isinstance(msg, bytes):
-                            msg = msg.decode("utf-8", "ignore")
-
-                        # Bybit sends JSON frames
-                        try:
-                            data = json.loads(msg)
-                        except json.JSONDecodeError:
-                            continue
-
-                        await self._handle_message(data)
+                        # text frames arrive as str, binary as bytes; both parse as-is
+                        # websockets keeps reading into its own queue while we
+                        # wait, and awaiting each frame keeps rows in order.
+                        rows = await loop.run_in_executor(PARSE_EXECUTOR, self._parse_frame, msg)
+                        if rows:
+                            self.writer.write_rows(rows)
+                            if self.writer.is_backpressured():
+                                await wait_writable(self.writer)
 
             except Exception as e:
-                logging.error(f"[bybit/{self.market}] WS error: {e}. Reconnecting in {backoff:.1f}s...")
+                backoff = reconnect_delay(retry)
+                retry += 1
+                log.warning("[bybit/%s] WS error: %s. Reconnecting in %.1fs...", self.market, e, backoff)
                 await asyncio.sleep(backoff)
-                backoff = min(30.0, backoff * 1.8)
 
     # -------------------- Internals --------------------
 
@@ -110,15 +181,17 @@ class BybitAdapter:
         url = "https://api.bybit.com/v5/market/instruments-info"
         params = {"category": self.category}
         try:
-            r = requests.get(url, params=params, timeout=20)
-            r.raise_for_status()
-            data = r.json()
+            # async HTTP so other streams keep flowing while Bybit discovers symbols
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=20)) as session:
+                async with session.get(url, params=params) as r:
+                    r.raise_for_status()
+                    data = await r.json(loads=_loads)
             items = (data or {}).get("result", {}).get("list", []) or []
             symbols = [it["symbol"] for it in items if it.get("symbol")]
-            logging.info(f"[bybit/{self.market}] Discovered {len(symbols)} symbols for {self.category}.")
+            log.info("[bybit/%s] Discovered %d symbols for %s.", self.market, len(symbols), self.category)
             return symbols
         except Exception as e:
-            logging.error(f"[bybit/{self.market}] Error fetching symbols: {e}")
+            log.error("[bybit/%s] Error fetching symbols: %s", self.market, e)
             return []
 
     async def _subscribe(self, ws, symbols: List[str]):
@@ -131,45 +204,119 @@ class BybitAdapter:
             chunk = symbols[i : i + self.subscribe_chunk]
             args = [f"{prefix}.{s}" for s in chunk]
             sub = {"op": "subscribe", "args": args}
-            await ws.send(json.dumps(sub))
+            await ws.send(_dumps(sub))
             sent += len(chunk)
-            logging.info(f"[bybit/{self.market}] Subscribed {sent}/{total}")
+            log.info("[bybit/%s] Subscribed %d/%d", self.market, sent, total)
             # Try to read an ack to keep the buffer clean (don't block forever)
             try:
                 ack = await asyncio.wait_for(ws.recv(), timeout=3)
-                # Optional: logging.debug(f"[bybit/{self.market}] Sub ack: {ack}")
+                # Optional: log.debug("[bybit/%s] Sub ack: %s", self.market, ack)
             except asyncio.TimeoutError:
                 pass
             await asyncio.sleep(0.1)  # gentle pacing
 
-    async def _handle_message(self, data: dict):
+    def _parse_frame(self, msg: Any) -> List[LiqRow]:
+        """Parse + normalize one frame. Runs on the parse executor thread."""
+        # Bybit sends JSON frames; JSONDecodeError (either parser) and invalid
+        # UTF-8 in a binary frame are both ValueErrors
+        if _FRAME_DECODER is not None:
+            try:
+                return self._handle_message_typed(msg)
+            except (msgspec.DecodeError, UnicodeDecodeError):
+                pass  # dict-shaped legacy data or an odd field; take the generic path
+        try:
+            data = _loads(msg)
+        except ValueError:
+            return []
+        return self._handle_message(data)
+
+    def _handle_message_typed(self, msg: Any) -> List[LiqRow]:
+        """
+        msgspec fast path: numeric strings become floats in the one decode
+        pass, no per-field dict.get()/float(). Raises msgspec.DecodeError on
+        anything it can't type (e.g. legacy dict-shaped data) so the caller
+        can fall back to _handle_message.
+        """
+        frame = _FRAME_DECODER.decode(msg)
+        topic = frame.topic
+        if not topic or frame.data is None:
+            return []
+        if not (topic.startswith("allLiquidation.") or topic.startswith("liquidation.")):
+            return []
+        ts_ingest_ms = _now_ms()  # one clock read per frame
+
+        out: List[LiqRow] = []
+        if self.emit_raw:
+            # keep each row's exact JSON text for `raw`
+            for raw in _RAW_ROWS_DECODER.decode(frame.data):
+                out.append(self._process_liquidation_typed(
+                    _ROW_DECODER.decode(raw), frame.ts, ts_ingest_ms, bytes(raw).decode()))
+        else:
+            for liq in _ROWS_DECODER.decode(frame.data):
+                out.append(self._process_liquidation_typed(liq, frame.ts, ts_ingest_ms, None))
+        return out
+
+    def _process_liquidation_typed(self, liq, msg_ts: Optional[int], ts_ingest_ms: int,
+                                   raw: Optional[str]) -> LiqRow:
+        """Same mapping as _process_liquidation_any, over a decoded _BybitLiq."""
+        qty = liq.v or liq.size
+        price = liq.p or liq.price
+
+        if liq.T is not None:
+            ts_exch_ms = liq.T
+        elif liq.updatedTimeE6 is not None:
+            ts_exch_ms = liq.updatedTimeE6 // 1000
+        else:
+            ts_exch_ms = msg_ts
+
+        return LiqRow(
+            exchange=self.EXCHANGE,
+            market=self.market,
+            symbol=intern_symbol(liq.s or liq.symbol),
+            side=_SIDE_MAP.get(liq.S or liq.side, ""),
+            qty=qty,
+            price=price,
+            notional=price * qty,
+            ts_exch_ms=ts_exch_ms,
+            ts_ingest_ms=ts_ingest_ms,
+            raw=raw,
+        )
+
+    def _handle_message(self, data: dict) -> List[LiqRow]:
         """Dispatch per topic and normalize."""
+        out: List[LiqRow] = []
         topic = data.get("topic", "")
         if not topic:
-            return
+            return out
+        ts_ingest_ms = _now_ms()  # one clock read per frame
 
         # New channel: allLiquidation.<SYMBOL>  (data: list of compact rows)
         if topic.startswith("allLiquidation."):
             rows = data.get("data") or []
             msg_ts = data.get("ts")
             for liq in rows:
-                self._process_liquidation_any(liq, msg_ts)
-            return
+                row = self._process_liquidation_any(liq, msg_ts, ts_ingest_ms)
+                if row is not None:
+                    out.append(row)
+            return out
 
         # Legacy channel: liquidation.<SYMBOL>  (data: dict or list)
         if topic.startswith("liquidation."):
             rows = data.get("data")
             if rows is None:
-                return
+                return out
             msg_ts = data.get("ts")
             if isinstance(rows, dict):
-                self._process_liquidation_any(rows, msg_ts)
-            else:
-                for liq in rows:
-                    self._process_liquidation_any(liq, msg_ts)
-            return
+                rows = [rows]
+            for liq in rows:
+                row = self._process_liquidation_any(liq, msg_ts, ts_ingest_ms)
+                if row is not None:
+                    out.append(row)
+            return out
+
+        return out
 
-    def _process_liquidation_any(self, liq: dict, msg_ts: Optional[int]):
+    def _process_liquidation_any(self, liq: dict, msg_ts: Optional[int], ts_ingest_ms: int) -> Optional[LiqRow]:
         """
         Normalize both Bybit schemas:
 
@@ -179,22 +326,22 @@ class BybitAdapter:
         Legacy liquidation rows:
           { "updatedTimeE6": "...", "symbol": "BTCUSDT", "side": "Buy"/"Sell", "size": "0.01", "price": "30000" }
 
-        Emits unified schema required by WriterShim/CSVWriter.
+        Returns a row in the unified schema required by WriterShim/CSVWriter,
+        or None if the row could not be normalized.
         """
         try:
             # Symbol
-            symbol = liq.get("s") or liq.get("symbol") or ""
+            symbol = intern_symbol(liq.get("s") or liq.get("symbol") or "")
 
             # Side mapping -> which positions were liquidated:
             #   "Buy"  => shorts liquidated (forced buy to cover)
             #   "Sell" => longs  liquidated (forced sell to close)
-            side_raw = (liq.get("S") or liq.get("side") or "").lower()
-            liq_side = "short" if side_raw == "buy" else "long" if side_raw == "sell" else ""
+            liq_side = _SIDE_MAP.get(liq.get("S") or liq.get("side") or "", "")
 
             # Qty / Price
             qty = _to_float(liq.get("v") or liq.get("size") or 0)
             price = _to_float(liq.get("p") or liq.get("price") or 0)
-            notional = price * qty if price and qty else 0.0
+            notional = price * qty
 
             # Timestamps (ms)
             ts_exch_ms = None
@@ -205,23 +352,24 @@ class BybitAdapter:
             elif msg_ts is not None:
                 ts_exch_ms = int(msg_ts)
 
-            out = {
-                "exchange": self.EXCHANGE,
-                "market": self.market,         # "usdt" or "coin"
-                "symbol": symbol,
-                "side": liq_side,              # "long" | "short"
-                "qty": qty,
-                "price": price,
-                "notional": notional,
-                "ts_exch_ms": ts_exch_ms,
-                "ts_ingest_ms": _now_ms(),
-                "raw": json.dumps(liq, separators=(",", ":")),
-            }
+            out = LiqRow(
+                exchange=self.EXCHANGE,
+                market=self.market,            # "usdt" or "coin"
+                symbol=symbol,
+                side=liq_side,                 # "long" | "short"
+                qty=qty,
+                price=price,
+                notional=notional,
+                ts_exch_ms=ts_exch_ms,
+                ts_ingest_ms=ts_ingest_ms,
+                raw=_dumps(liq) if self.emit_raw else None,
+            )
 
             # Terminal print (coloring handled by WriterShim if you added it)
             # print(f"[bybit/{self.market}] {symbol} | {liq_side} | qty={qty} @ {price} (notional={notional})")
 
-            self.writer.write_row(out)
+            return out
 
         except Exception as e:
-            logging.error(f"[bybit/{self.market}] normalize error: {e} :: {liq}")
+            log.error("[bybit/%s] normalize error: %s :: %s", self.market, e, liq)
+            return None
@@ -3,13 +3,35 @@
 import asyncio
 import io
 import json
+import logging
+import mmap
 import os
+import sys
 import time
+from collections import OrderedDict
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json works the same, just slower
+    orjson = None
+
+try:
+    from ciso8601 import parse_datetime as _parse_iso
+except ImportError:  # optional: C ISO-8601 parser; fromisoformat gives the same result
+    _parse_iso = datetime.fromisoformat
+
+from schema import LiqRow
+from ._shared import wait_writable
+
+log = logging.getLogger(__name__)
+
+_loads = orjson.loads if orjson is not None else json.loads
 
 def _now_ms() -> int:
-    return int(time.time() * 1000)
+    return time.time_ns() // 1_000_000
 
 def _to_ms(ts: Any) -> Optional[int]:
     """
@@ -18,20 +40,22 @@ def _to_ms(ts: Any) -> Optional[int]:
     """
     if ts is None:
         return None
-    # numeric?
-    try:
-        v = float(ts)
-        # Heuristic: < 1e12 => seconds; >= 1e12 => ms
-        return int(v * 1000) if v < 1e12 else int(v)
-    except Exception:
-        pass
+    # Heuristic: < 1e12 => seconds; >= 1e12 => ms
+    if isinstance(ts, (int, float)):
+        return int(ts * 1000) if ts < 1e12 else int(ts)
+    s = ts if isinstance(ts, str) else str(ts)
+    # numeric string? ("2025-..." can't be one, so skip float()'s raise for ISO)
+    if not (len(s) >= 10 and s[4] == "-"):
+        try:
+            v = float(s)
+            return int(v * 1000) if v < 1e12 else int(v)
+        except ValueError:
+            pass
     # string (ISO-ish)
     try:
-        from datetime import datetime
         # allow "2025-09-23T12:34:56.789Z" or without Z
-        s = str(ts).rstrip("Z")
-        dt = datetime.fromisoformat(s)
-        return int(dt.timestamp() * 1000)
+        s = s.rstrip("Z")
+        return int(_parse_iso(s).timestamp() * 1000)
     except Exception:
         return None
 
@@ -47,50 +71,103 @@ def _liq_side_from_kind(kind: str) -> Optional[str]:
         return "short"
     return None
 
+# canonical 'dir' values -> kind; one dict hit covers nearly every fill
+_DIR_KIND = {"Close Long": "Long", "Close Short": "Short"}
+_SIDE_KIND = {"A": "Long", "a": "Long", "B": "Short", "b": "Short"}
+
 def _classify_liq_kind(dir_str: str, side: str) -> str:
     """
     Mirror your script: prefer textual hint in 'dir'; fall back to side A/B.
     """
+    kind = _DIR_KIND.get(dir_str)
+    if kind is not None:
+        return kind
     d = (dir_str or "").lower()
-    s = (side or "").upper()
     if "close long" in d:
         return "Long"
     if "close short" in d:
         return "Short"
-    return "Long" if s == "A" else ("Short" if s == "B" else "Unknown")
+    return _SIDE_KIND.get(side, "Unknown")
+
+_LIQ_USER = b'"liquidatedUser":"'
+
+def _may_have_self_liq(line: bytes) -> bool:
+    """
+    Byte-level pre-check for _parse_line_liqs: can any fill on this line have
+    taker == liquidatedUser? Only answers False for the compact node layout
+    (events as ["0x<taker>",{...}]) when no liquidatedUser value also appears
+    as a taker; anything unfamiliar is left to the JSON parser.
+    """
+    if b'["0x' not in line:
+        return True
+    i = line.find(_LIQ_USER)
+    if i < 0:
+        return True
+    while i >= 0:
+        start = i + len(_LIQ_USER)
+        end = line.find(b'"', start)
+        if end < 0:
+            return True
+        if b'["' + line[start:end] + b'",' in line:
+            return True
+        i = line.find(_LIQ_USER, end)
+    return False
 
 def _abs_float(x: Any) -> Optional[float]:
+    if x.__class__ is float or x.__class__ is int:
+        return abs(float(x))  # already numeric: skip the try/except setup
     try:
         return abs(float(x))
     except Exception:
         return None
 
-def _iter_all_hour_files(root: Path) -> List[Path]:
+def _iter_all_hour_files(root: Path) -> List[str]:
     """
-    Return all hour files sorted by day (asc) then hour (asc).
+    Return all hour files sorted by day (asc) then hour (asc), as path strings.
     Expects directory structure: root/YYYYMMDD/HH (files named '0'..'23')
     """
-    files: List[Path] = []
-    if not root.exists():
-        return files
-    # days like 20250923
-    for d in sorted([p for p in root.iterdir() if p.is_dir() and p.name.isdigit()], key=lambda p: int(p.name)):
-        # hours like 0..23 (files)
-        hours = [f for f in d.iterdir() if f.is_file() and f.name.isdigit()]
-        hours_sorted = sorted(hours, key=lambda p: int(p.name))
-        files.extend(hours_sorted)
-    return files
+    keyed: List[Tuple[int, int, str]] = []
+    try:
+        with os.scandir(root) as days:
+            # days like 20250923
+            day_dirs = [d for d in days if d.name.isdigit() and d.is_dir()]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+    for d in day_dirs:
+        day = int(d.name)
+        with os.scandir(d.path) as hours:
+            # hours like 0..23 (files)
+            keyed.extend((day, int(h.name), h.path) for h in hours if h.name.isdigit() and h.is_file())
+    keyed.sort()
+    return [path for _, _, path in keyed]
 
 def _latest_hour_file(root: Path) -> Optional[Path]:
-    files = _iter_all_hour_files(root)
-    return files[-1] if files else None
+    """
+    Newest hour file: a max-scan with os.scandir instead of listing and
+    sorting every file (this runs on every rollover check). Walks back a day
+    if the newest day directory has no hour file yet.
+    """
+    try:
+        with os.scandir(root) as it:
+            days = [e for e in it if e.name.isdigit() and e.is_dir()]
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    days.sort(key=lambda e: int(e.name), reverse=True)
+    for day in days:
+        with os.scandir(day.path) as it:
+            hour = max((e for e in it if e.name.isdigit() and e.is_file()),
+                       key=lambda e: int(e.name), default=None)
+        if hour is not None:
+            return Path(hour.path)
+    return None
 
 def _open_follow(path: Path):
-    f = open(path, "r", encoding="utf-8")
+    # binary mode: lines are filtered and parsed as bytes, never decoded
+    f = open(path, "rb")
     f.seek(0, io.SEEK_END)
     ino = os.fstat(f.fileno()).st_ino
     pos = f.tell()
-    buf = ""
+    buf = bytearray()
     return f, ino, pos, buf
 
 def _rotated(path: Path, ino: int, pos: int) -> bool:
@@ -100,6 +177,43 @@ def _rotated(path: Path, ino: int, pos: int) -> bool:
         return True
     return (st.st_ino != ino) or (st.st_size < pos)
 
+_BACKFILL_CHUNK = 1 << 20  # bytes of file scanned per backfill step
+
+def _open_mapped(path: str):
+    """Open an hour file and mmap it read-only (mm is None for an empty file)."""
+    f = open(path, "rb")
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            return f, None
+        return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception:
+        f.close()
+        raise
+
+def _scan_candidates(mm, pos: int) -> Tuple[bytes, int]:
+    """
+    From `pos`, jump between b"liquidation" hits (memchr-speed find over the
+    mapping) for ~_BACKFILL_CHUNK bytes and copy out only the lines that
+    contain one. Returns those lines newline-joined and the next position.
+    """
+    size = len(mm)
+    stop = pos + _BACKFILL_CHUNK
+    lines = []
+    while pos < size:
+        hit = mm.find(b"liquidation", pos)
+        if hit < 0:
+            pos = size
+            break
+        start = mm.rfind(b"\n", pos, hit) + 1 or pos
+        end = mm.find(b"\n", hit)
+        if end < 0:
+            end = size
+        lines.append(mm[start:end])
+        pos = end + 1
+        if pos >= stop:
+            break
+    return (b"\n".join(lines) + b"\n") if lines else b"", pos
+
 class HyperliquidAdapter:
     """
     Reads Hyperliquid node fill logs produced by hl-visor (hourly rolling files) and emits
@@ -138,37 +252,42 @@ class HyperliquidAdapter:
         catch_up: bool = True,  # process historical files before tailing
     ):
         self.writer = writer
-        self.market = market  # "usdc" is accurate for HL perps
+        self.market = sys.intern(market)  # "usdc" is accurate for HL perps; shared by every row
         self.root = Path(root_dir or (Path.home() / "hl" / "data" / "node_fills_streaming" / "hourly"))
         self.min_abs_sz = float(min_abs_sz)
         self.poll_sec = float(poll_sec)
         self.rollover_check_sec = float(rollover_check_sec)
         self.catch_up = bool(catch_up)
 
-        # simple in-memory dedupe ring
-        from collections import deque
-        self._seen = set()
-        self._ring = deque(maxlen=50_000)
+        # bounded in-memory dedupe (LRU): one hash op per miss, plus an
+        # eviction once full
+        self._seen: "OrderedDict[Tuple[Any, Any, Any], None]" = OrderedDict()
+        self._seen_max = 50_000
 
-    def _seen_key(self, e: Dict[str, Any]) -> str:
-        return f"{e.get('tid')}|{e.get('liq_user')}|{e.get('coin')}"
+    def _seen_key(self, e: Dict[str, Any]) -> Tuple[Any, Any, Any]:
+        # tuple hashes from its items' hashes; no joined str to build and hash
+        return (e.get("tid"), e.get("liq_user"), e.get("coin"))
 
-    def _check_seen(self, k: str) -> bool:
-        if k in self._seen:
+    def _check_seen(self, k: Tuple[Any, Any, Any]) -> bool:
+        seen = self._seen
+        if k in seen:
+            seen.move_to_end(k)
             return True
-        self._seen.add(k)
-        self._ring.append(k)
-        if len(self._ring) == self._ring.maxlen:
-            old = self._ring.popleft()
-            self._seen.discard(old)
+        seen[k] = None
+        if len(seen) > self._seen_max:
+            seen.popitem(last=False)
         return False
 
-    def _parse_line_liqs(self, line: str) -> List[Dict[str, Any]]:
+    def _parse_line_liqs(self, line: bytes) -> List[Tuple[Dict[str, Any], float]]:
+        """Self-liquidation fills on one line, each with its |sz| (computed once)."""
+        # most liquidation lines are the counterparty side; skip those unparsed
+        if not _may_have_self_liq(line):
+            return []
         try:
-            rec = json.loads(line)
-        except json.JSONDecodeError:
+            rec = _loads(line)
+        except ValueError:
             return []
-        out: List[Dict[str, Any]] = []
+        out: List[Tuple[Dict[str, Any], float]] = []
         lt = rec.get("local_time")
         bt = rec.get("block_time")
         bn = rec.get("block_number")
@@ -191,7 +310,7 @@ class HyperliquidAdapter:
             if sz_abs is None or sz_abs < self.min_abs_sz:
                 continue
 
-            out.append({
+            out.append(({
                 "local_time": lt,
                 "block_time": bt,
                 "block_number": bn,
@@ -208,70 +327,134 @@ class HyperliquidAdapter:
                 "liq_mark_px": liq.get("markPx"),
                 "liq_method": liq.get("method"),
                 "liq_kind": _classify_liq_kind(fill.get("dir"), fill.get("side")),
-            })
+            }, sz_abs))
         return out
 
-    def _normalize_and_write(self, e: Dict[str, Any]):
+    def _normalize_and_write(self, e: Dict[str, Any], qty: float):
         """
-        Map HL liquidation fill -> unified schema row.
+        Map HL liquidation fill -> unified schema row. `qty` is |sz| as
+        already computed by _parse_line_liqs.
         """
+        eg = e.get  # bound once; called per fill during backfill bursts
         ts_ingest = _now_ms()
         # timestamps: prefer block_time
-        ts_exch_ms = _to_ms(e.get("block_time")) or _to_ms(e.get("local_time"))
+        to_ms = _to_ms
+        ts_exch_ms = to_ms(eg("block_time")) or to_ms(eg("local_time"))
 
         # symbol: coin + "USDC" for HL perps
-        coin = (e.get("coin") or "").upper()
-        symbol = f"{coin}USDC" if coin else ""
+        coin = (eg("coin") or "").upper()
+        symbol = coin + "USDC" if coin else ""
 
-        # price & qty
-        price = None
-        qty = None
+        # price (qty comes in already parsed)
         try:
-            price = float(e.get("px") or 0.0)
+            price = float(eg("px") or 0.0)
         except Exception:
             price = None
-        try:
-            qty = _abs_float(e.get("sz"))
-        except Exception:
-            qty = None
 
         notional = (price * qty) if (price and qty) else None
 
-        side_kind = e.get("liq_kind") or ""
-        side = _liq_side_from_kind(side_kind)  # "long" | "short" | None
-
-        raw = json.dumps(e, separators=(",", ":"))
-
-        out = {
-            "exchange": self.EXCHANGE,
-            "market": self.market,        # "usdc"
-            "symbol": symbol,
-            "side": side,                 # "long" or "short"
-            "qty": qty,
-            "price": price,
-            "notional": notional,
-            "ts_exch_ms": ts_exch_ms,
-            "ts_ingest_ms": ts_ingest,
-            "raw": raw,
-        }
+        side = _liq_side_from_kind(eg("liq_kind") or "")  # "long" | "short" | None
+
+        out = LiqRow(
+            exchange=self.EXCHANGE,
+            market=self.market,           # "usdc"
+            symbol=symbol,
+            side=side,                    # "long" or "short"
+            qty=qty,
+            price=price,
+            notional=notional,
+            ts_exch_ms=ts_exch_ms,
+            ts_ingest_ms=ts_ingest,
+            raw=e,                        # serialized only if a sink stores it
+        )
         self.writer.write_row(out)
 
-    def _process_file_full(self, path: Path):
+    def _emit_lines(self, buf) -> int:
         """
-        Read a whole hour file from start, emit rows.
+        Process every complete line in `buf` (bytes or bytearray) and return
+        the offset just past the last newline. Lines are walked with a moving
+        offset; re-splitting the whole buffer per line would be quadratic.
         """
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                for line in f:
-                    if "liquidation" not in line:
+        start = 0
+        while True:
+            nl = buf.find(b"\n", start)
+            if nl < 0:
+                return start
+            # bytes reject in place, so non-liquidation lines are never copied/decoded
+            if buf.find(b"liquidation", start, nl) >= 0:
+                for ev, sz_abs in self._parse_line_liqs(buf[start:nl]):
+                    k = self._seen_key(ev)
+                    if self._check_seen(k):
+                        continue
+                    self._normalize_and_write(ev, sz_abs)
+            start = nl + 1
+
+    async def _backfill(self, files: List[str]):
+        """
+        Replay whole hour files. A producer scans each mmapped file on a
+        worker thread and queues only the candidate lines, while this
+        coroutine parses the previous batch; the bounded queue keeps
+        read-ahead (and memory) in check.
+        """
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Optional[Tuple[str, bytes]]]" = asyncio.Queue(maxsize=8)
+
+        async def produce():
+            try:
+                for path in files:
+                    try:
+                        f, mm = await loop.run_in_executor(None, _open_mapped, path)
+                    except Exception as e:
+                        log.error("[hyperliquid] error reading %s: %s", path, e)
                         continue
-                    for ev in self._parse_line_liqs(line):
-                        k = self._seen_key(ev)
-                        if self._check_seen(k):
-                            continue
-                        self._normalize_and_write(ev)
-        except Exception as e:
-            print(f"[hyperliquid] error reading {path}: {e}")
+                    scan = None
+                    try:
+                        pos, size = 0, (len(mm) if mm is not None else 0)
+                        while pos < size:
+                            scan = loop.run_in_executor(None, _scan_candidates, mm, pos)
+                            # shielded: a cancel must not lose track of a scan
+                            # still reading mm on the worker thread
+                            chunk, pos = await asyncio.shield(scan)
+                            if chunk:
+                                await queue.put((path, chunk))
+                    except Exception as e:
+                        log.error("[hyperliquid] error reading %s: %s", path, e)
+                    finally:
+                        if scan is not None and not scan.done():
+                            # cancelled mid-scan: unmap only once the worker is done
+                            await asyncio.wait((scan,))
+                        if mm is not None:
+                            mm.close()
+                        f.close()
+            except asyncio.CancelledError:
+                # no sentinel: the consumer is gone, and a put on a full
+                # queue would never return
+                raise
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                path, chunk = item
+                try:
+                    self._emit_lines(chunk)
+                except Exception as e:
+                    log.error("[hyperliquid] error reading %s: %s", path, e)
+                # let the other streams run between chunks, and hold off
+                # while the PG writer catches up
+                await asyncio.sleep(0)
+                if self.writer.is_backpressured():
+                    await wait_writable(self.writer)
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+                # wait (without re-raising its CancelledError) so the open
+                # file and mapping are closed before we return
+                await asyncio.wait((producer,))
 
     async def _tail_latest(self):
         """
@@ -279,11 +462,11 @@ class HyperliquidAdapter:
         """
         current = _latest_hour_file(self.root)
         while not current:
-            print(f"[hyperliquid] waiting for hour file under {self.root} …")
+            log.info("[hyperliquid] waiting for hour file under %s …", self.root)
             await asyncio.sleep(1.0)
             current = _latest_hour_file(self.root)
 
-        print(f"[hyperliquid] tailing {current.parent.name}/{current.name} -> {current}")
+        log.info("[hyperliquid] tailing %s/%s -> %s", current.parent.name, current.name, current)
         f, ino, pos, buf = _open_follow(current)
         last_roll = time.time()
         hb = 0.0
@@ -299,7 +482,7 @@ class HyperliquidAdapter:
                         except Exception:
                             pass
                         current = latest
-                        print(f"[hyperliquid] rollover -> {current.parent.name}/{current.name}")
+                        log.info("[hyperliquid] rollover -> %s/%s", current.parent.name, current.name)
                         f, ino, pos, buf = _open_follow(current)
                     last_roll = time.time()
 
@@ -315,7 +498,7 @@ class HyperliquidAdapter:
                 if not chunk:
                     now = time.time()
                     if now - hb >= 30:
-                        print(f"[hyperliquid] heartbeat file={current}")
+                        log.info("[hyperliquid] heartbeat file=%s", current)
                         hb = now
                     await asyncio.sleep(self.poll_sec)
                     continue
@@ -323,15 +506,12 @@ class HyperliquidAdapter:
                 pos = f.tell()
                 buf += chunk
 
-                while "\n" in buf:
-                    line, buf = buf.split("\n", 1)
-                    if not line.strip() or "liquidation" not in line:
-                        continue
-                    for ev in self._parse_line_liqs(line):
-                        k = self._seen_key(ev)
-                        if self._check_seen(k):
-                            continue
-                        self._normalize_and_write(ev)
+                # drop the consumed prefix once per read
+                start = self._emit_lines(buf)
+                if start:
+                    del buf[:start]
+                if self.writer.is_backpressured():
+                    await wait_writable(self.writer)
         finally:
             try:
                 f.close()
@@ -343,9 +523,8 @@ class HyperliquidAdapter:
         if self.catch_up:
             files = _iter_all_hour_files(self.root)
             if files:
-                print(f"[hyperliquid] backfilling {len(files)} hour files from {self.root}")
-            for p in files:
-                self._process_file_full(p)
+                log.info("[hyperliquid] backfilling %d hour files from %s", len(files), self.root)
+                await self._backfill(files)
 
         # 2) tail latest live
         await self._tail_latest()
@@ -2,45 +2,88 @@
 
 import asyncio
 import json
+import logging
+import sys
 import time
 from typing import Any, Dict, List
 
 import websockets
 
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json works the same, just slower
+    orjson = None
+
+from schema import LiqRow
+from ._shared import PARSE_EXECUTOR, wait_writable
+
+log = logging.getLogger(__name__)
+
 OKX_WS = "wss://ws.okx.com:8443/ws/v5/public"
 
+if orjson is not None:
+    _loads = orjson.loads
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+else:
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
 def _now_ms() -> int:
-    return int(time.time() * 1000)
+    return time.time_ns() // 1_000_000
+
+# posSide -> liquidated side ("net" and anything else -> ""); every casing is
+# listed so the loop needs no .lower()
+_POS_SIDE = {
+    "long": "long", "Long": "long", "LONG": "long",
+    "short": "short", "Short": "short", "SHORT": "short",
+}
+
+_USDTM_SUFFIXES = ("-USDT-SWAP", "-USDC-SWAP")
 
 def _okx_is_usdtm(inst_id: str) -> bool:
-    # e.g., "BTC-USDT-SWAP"
-    return inst_id.endswith("-USDT-SWAP") or inst_id.endswith("-USDC-SWAP")
+    # e.g., "BTC-USDT-SWAP"; one endswith call over both suffixes
+    return inst_id.endswith(_USDTM_SUFFIXES)
 
 def _okx_is_coinm(inst_id: str) -> bool:
     # e.g., "BTC-USD-SWAP"
     return inst_id.endswith("-USD-SWAP")
 
+def _okx_any_inst(inst_id: str) -> bool:
+    return True
+
 class OKXAdapter:
     EXCHANGE = "okx"
 
     def __init__(self, writer, market: str):
         self.writer = writer
-        self.market = (market or "").lower()  # "usdt" or "coin"
+        # interned: lower() returns a fresh str, and every row carries this one
+        self.market = sys.intern((market or "").lower())  # "usdt" or "coin"
+        # instrument filter for this market, picked once instead of per frame
+        if self.market == "usdt":
+            self._inst_ok = _okx_is_usdtm
+        elif self.market in ("coin", "coinm", "inverse"):
+            self._inst_ok = _okx_is_coinm
+        else:
+            self._inst_ok = _okx_any_inst
 
     async def _subscribe(self, ws):
         sub = {
             "op": "subscribe",
             "args": [{"channel": "liquidation-orders", "instType": "SWAP"}]
         }
-        await ws.send(json.dumps(sub))
+        await ws.send(_dumps(sub))
         # read ack
         try:
             ack = await asyncio.wait_for(ws.recv(), timeout=5)
-            # optional: print(f"[okx] Sub ack: {ack}")
+            # optional: log.debug("[okx] Sub ack: %s", ack)
         except asyncio.TimeoutError:
             pass
 
-    def _normalize_and_write(self, msg: Dict[str, Any]):
+    def _normalize_batch(self, msg: Dict[str, Any]) -> List[LiqRow]:
         """
         OKX 'liquidation-orders' payload looks like:
         {
@@ -56,74 +99,87 @@ class OKXAdapter:
           ]
         }
         """
+        rows: List[LiqRow] = []
         try:
             arg = msg.get("arg", {}) or {}
             if arg.get("channel") != "liquidation-orders":
-                return
+                return rows
             data = msg.get("data") or []
             if not data:
-                return
+                return rows
 
             ts_ingest = _now_ms()
+            # locals for the per-detail loop; cascades put dozens of details in a frame
+            exchange = self.EXCHANGE
+            market = self.market
+            append = rows.append
+            inst_ok = self._inst_ok
             for liq in data:
                 inst_id = liq.get("instId", "")
-                if self.market == "usdt" and not _okx_is_usdtm(inst_id):
-                    continue
-                if self.market in ("coin", "coinm", "inverse") and not _okx_is_coinm(inst_id):
+                if not inst_ok(inst_id):
                     continue
 
                 # OKX groups multiple liquidations by instrument under "details"
-                details = liq.get("details") or []
-                for d in details:
+                for d in liq.get("details") or ():
+                    get = d.get
                     # Map OKX sides to "long"/"short" liquidations
                     # posSide: "long"/"short"
                     # side:    "buy"/"sell" (direction of the liquidation trade)
                     # We report which positions are being liquidated using posSide.
-                    pos_side = (d.get("posSide") or "").lower()
-                    liq_side = pos_side if pos_side in ("long", "short") else ""
-
-                    price = float(d.get("fillPx") or d.get("bkPx") or 0.0)
-                    qty   = float(d.get("sz") or 0.0)
-                    notional = price * qty if price and qty else None
-
-                    ts_exch = None
-                    if d.get("ts"):
-                        ts_exch = int(d["ts"])
-
-                    out = {
-                        "exchange": self.EXCHANGE,
-                        "market": self.market,
-                        "symbol": inst_id,         # you can map to "BTCUSDT" later if you prefer
-                        "side": liq_side,          # long/short liquidated
-                        "qty": qty,
-                        "price": price,
-                        "notional": notional,
-                        "ts_exch_ms": ts_exch,
-                        "ts_ingest_ms": ts_ingest,
-                        "raw": json.dumps(d, separators=(",", ":"))
-                    }
-                    self.writer.write_row(out)
+                    liq_side = _POS_SIDE.get(get("posSide"), "")
+
+                    price = float(get("fillPx") or get("bkPx") or 0.0)
+                    qty   = float(get("sz") or 0.0)
+
+                    ts = get("ts")
+                    append(LiqRow(
+                        exchange=exchange,
+                        market=market,
+                        symbol=inst_id,            # you can map to "BTCUSDT" later if you prefer
+                        side=liq_side,             # long/short liquidated
+                        qty=qty,
+                        price=price,
+                        notional=price * qty,
+                        ts_exch_ms=int(ts) if ts else None,
+                        ts_ingest_ms=ts_ingest,
+                        raw=d,                     # serialized only if a sink stores it
+                    ))
         except Exception as e:
-            print(f"[okx] Error normalizing: {e}")
+            log.error("[okx] Error normalizing: %s", e)
+        return rows
+
+    def _parse_frame(self, msg: Any) -> List[LiqRow]:
+        """Parse + normalize one frame. Runs on the parse executor thread."""
+        data = _loads(msg)
+        if not isinstance(data, dict) or data.get("event") == "pong":
+            return []
+        return self._normalize_batch(data)
 
     async def run(self):
-        print(f"[okx] Connecting {OKX_WS} (market={self.market})")
-        async for ws in websockets.connect(OKX_WS, ping_interval=20, ping_timeout=10, max_size=10_000_000):
+        log.info("[okx] Connecting %s (market=%s)", OKX_WS, self.market)
+        loop = asyncio.get_running_loop()
+        async for ws in websockets.connect(
+            OKX_WS, ping_interval=20, ping_timeout=10, max_size=10_000_000,
+            max_queue=64, compression=None,
+        ):
             try:
                 await self._subscribe(ws)
                 while True:
                     msg = await ws.recv()
-                    if isinstance(msg, bytes):
-                        msg = msg.decode("utf-8", "ignore")
+                    # text frames arrive as str, binary as bytes; both parse as-is
                     # OKX ping/pong: sometimes "ping" string or JSON "event":"ping"
-                    if msg == "ping":
+                    if msg == "ping" or msg == b"ping":
                         await ws.send("pong")
                         continue
-                    data = json.loads(msg)
-                    if data.get("event") == "pong":
-                        continue
-                    self._normalize_and_write(data)
+                    # parse off the event loop; awaiting each frame keeps rows
+                    # in order, and one hand-off per frame lets sinks see the
+                    # whole batch at once
+                    rows = await loop.run_in_executor(PARSE_EXECUTOR, self._parse_frame, msg)
+                    if rows:
+                        self.writer.write_rows(rows)
+                        if self.writer.is_backpressured():
+                            await wait_writable(self.writer)
             except Exception as e:
-                print(f"[okx] WS error: {e}; reconnecting in 3s...")
+                log.warning("[okx] WS error: %s; reconnecting in 3s...", e)
                 await asyncio.sleep(3)
                 continue
@@ -0,0 +1,22 @@
+# schema.py
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+@dataclass(slots=True)
+class LiqRow:
+    """
+    One normalized liquidation in the unified schema (see README).
+    Field order matches the CSV header and the Postgres column list.
+    """
+    exchange: str
+    market: str
+    symbol: str
+    side: Optional[str]           # "long" | "short" (positions liquidated)
+    qty: Optional[float]
+    price: Optional[float]
+    notional: Optional[float]
+    ts_exch_ms: Optional[int]
+    ts_ingest_ms: int
+    raw: Any                      # compact JSON from the exchange (or the parsed event; WriterShim serializes it)
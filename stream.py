@@ -2,14 +2,36 @@
 
 import argparse
 import asyncio
+import logging
 import os
+import queue
+import sys
+import threading
 from datetime import datetime, timezone
-from typing import Optional, Tuple, List
+from typing import TYPE_CHECKING, Optional, Tuple, List
 from pathlib import Path
 
-from adapters import get_adapter
-from writer_csv import CSVWriter
-from writer_pg import PostgresWriter  # NEW
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json works the same, just slower
+    orjson = None
+
+from schema import LiqRow
+from writer_csv import CSVSink, CSVWriter
+
+# adapters (websockets/aiohttp) and writer_pg (asyncpg) are imported where
+# they're first needed, so csv-only and --no-write runs don't load the PG stack
+if TYPE_CHECKING:
+    from writer_pg import PostgresWriter
+
+if orjson is not None:
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+else:
+    import json
+
+    def _dumps(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"))
 
 
 def parse_args():
@@ -36,20 +58,62 @@ def parse_args():
                    help="Batch size for inserts")
     p.add_argument("--pg-interval", type=float, default=float(os.environ.get("PG_INTERVAL", "1.0")),
                    help="Flush interval seconds")
+    p.add_argument("--pg-queue", type=int, default=int(os.environ.get("PG_QUEUE", "0")),
+                   help="Max rows buffered per Postgres shard before rows are dropped (default 10x --pg-batch)")
+    p.add_argument("--pg-overflow", choices=["drop_oldest", "drop_new"], default="drop_oldest",
+                   help="When the Postgres buffer is full: evict the oldest queued row, or drop the incoming one")
+    p.add_argument("--pg-shards", type=int, default=int(os.environ.get("PG_SHARDS", "1")),
+                   help="Parallel Postgres flush tasks/connections; rows are split by symbol (power of two)")
+    p.add_argument("--pg-encode-thread", action="store_true",
+                   help="Encode Postgres COPY batches in a worker thread instead of on the event loop")
+    p.add_argument("--pg-partition", action="store_true",
+                   help="Create the Postgres table partitioned by month on ts_exch_ms (new tables only)")
+    p.add_argument("--pg-unlogged", action="store_true",
+                   help="Create the Postgres table UNLOGGED: no WAL, but its rows are lost on a server crash (new tables only)")
+    p.add_argument("--pg-async-commit", action="store_true",
+                   help="synchronous_commit=off for writer sessions: a server crash may lose the last moments of rows")
     # NEW: Hyperliquid file adapter options
     p.add_argument("--hl-root", default=os.environ.get("HL_HOURLY_ROOT", ""),
                    help="Hyperliquid hourly fills root (defaults to ~/hl/data/node_fills_streaming/hourly)")
     p.add_argument("--hl-no-catchup", action="store_true",
                    help="Skip historical backfill for Hyperliquid; only tail the latest hour")
-    return p.parse_args()
+    args = p.parse_args()
+    if args.pg_partition and args.pg_unlogged:
+        p.error("--pg-partition and --pg-unlogged can't be combined (partitioned tables can't be UNLOGGED)")
+    # resolved once; everything downstream checks these instead of re-testing --sink
+    args.csv_enabled = args.sink in ("csv", "both") and not args.no_write
+    args.pg_enabled = args.sink in ("pg", "both") and not args.no_write
+    return args
+
+
+_DRAIN_MAX_ROWS = 4096  # cap on rows coalesced into one drain pass
+
+
+def _serialize_raw(rows):
+    # OKX/Hyperliquid hand over the parsed event as `raw`; serialize it once
+    # here for shims that write CSV (which also reuses it for Postgres)
+    for row in rows:
+        raw = row.raw
+        if raw is not None and raw.__class__ is not str:
+            row.raw = _dumps(raw)
+
+
+def _never_backpressured() -> bool:
+    return False
 
 
 class WriterShim:
     """
     Fan-out writer: prints, then forwards to CSV and/or Postgres.
+
+    Adapters call write_rows on the event loop. The Postgres hand-off stays
+    there (rows are appended to a per-shard deque and an asyncio.Event wakes
+    the flush task, no await per row), while printing and CSV writing
+    go through a SimpleQueue to a daemon thread, so terminal and file I/O
+    never stall a websocket reader. close() drains that thread.
     """
     def __init__(self, outdir: str, print_colors: bool, no_write: bool,
-                 csv_writer: Optional[CSVWriter], pg_writer: Optional[PostgresWriter]):
+                 csv_writer: Optional[CSVWriter], pg_writer: Optional["PostgresWriter"]):
         self.no_write = no_write
         self.csv_writer = csv_writer
         self.pg_writer = pg_writer
@@ -61,30 +125,116 @@ class WriterShim:
         self.CLR_DIM   = "\x1b[2m"
         self.CLR_RST   = "\x1b[0m"
 
-    def write_row(self, row: dict):
-        # terminal print
-        side = (row.get("side") or "").lower()
-        color = self.CLR_RED if side == "long" else self.CLR_GREEN if side == "short" else ""
-        line = (
-            f"[{row['exchange']}/{row['market']}] {row['symbol']} | "
-            f"{(color + row['side'] + self.CLR_RST) if color and row.get('side') else (row.get('side') or '')} | "
-            f"qty={row.get('qty')} @ {row.get('price')} "
-            f"({self.CLR_DIM}notional={row.get('notional')}{self.CLR_RST})"
-        )
-        if not self.print_colors:
-            # strip ANSI
-            import re
-            line = re.sub(r"\x1b\[[0-9;]*m", "", line)
-        print(line)
+        # adapters emit lowercase sides, so this is one dict hit per row
+        self._side_color = {"long": self.CLR_RED, "short": self.CLR_GREEN}
+
+        # chosen once: no per-row colour branch or stdout lookup
+        self._format = self._format_color if print_colors else self._format_plain
+        self._write = sys.stdout.write
+
+        # sink fan-out picked once: only a CSV shim walks rows for raw
+        # serialization (the PG writer's jsonb codec does its own), and only
+        # a PG shim touches the PG queue
+        if no_write or not (csv_writer or pg_writer):
+            self.write_rows = self._write_rows_print
+        elif pg_writer and csv_writer:
+            self.write_rows = self._write_rows_both
+        elif pg_writer:
+            self.write_rows = self._write_rows_pg
+        else:
+            self.write_rows = self._write_rows_csv
+        self._csv_write = csv_writer.write_rows if (csv_writer and not no_write) else None
+        # adapters poll this per frame and pause reading while the PG buffers
+        # are past their high-water mark (adapters._shared.wait_writable)
+        if pg_writer and not no_write:
+            self.is_backpressured = pg_writer.is_backpressured
+        else:
+            self.is_backpressured = _never_backpressured
+
+        self._q: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._drainer = threading.Thread(target=self._drain, name="writer-shim", daemon=True)
+        self._drainer.start()
 
-        if self.no_write:
-            return
+    def write_row(self, row: LiqRow):
+        self.write_rows((row,))
 
+    # write_rows is bound per instance to one of these. Each hands the whole
+    # batch to its sinks in one call; printing and CSV happen on the drain
+    # thread.
+
+    def _write_rows_both(self, rows):
+        _serialize_raw(rows)
+        self.pg_writer.write_rows(rows)
+        self._q.put(rows)
+
+    def _write_rows_pg(self, rows):
+        self.pg_writer.write_rows(rows)
+        self._q.put(rows)
+
+    def _write_rows_csv(self, rows):
+        _serialize_raw(rows)
+        self._q.put(rows)
+
+    def _write_rows_print(self, rows):
+        self._q.put(rows)
+
+    def _drain(self):
+        q = self._q
+        while True:
+            rows = q.get()
+            stop = rows is None
+            if not stop:
+                rows = list(rows)
+                # take whatever else is already queued: one stdout write and
+                # one CSV hand-off per burst instead of per frame
+                while len(rows) < _DRAIN_MAX_ROWS:
+                    try:
+                        more = q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if more is None:
+                        stop = True
+                        break
+                    rows.extend(more)
+                try:
+                    self._print_rows(rows)
+                    if self._csv_write:
+                        self._csv_write(rows)
+                except Exception as e:
+                    print(f"[writer] error: {e}")
+            if stop:
+                return
+
+    def close(self, timeout: float = 5.0):
+        """Finish queued rows, then flush the CSV file (its owner closes it)."""
+        self._q.put(None)
+        self._drainer.join(timeout)
         if self.csv_writer:
-            self.csv_writer.write_row(row)
+            self.csv_writer.flush()
 
-        if self.pg_writer:
-            self.pg_writer.write_row(row)
+    def _print_rows(self, rows):
+        # terminal print: the whole burst in one write call (one flush on a
+        # line-buffered tty), and lines from several shims can't interleave
+        # mid-line the way print()'s separate "\n" write can
+        fmt = self._format
+        self._write("".join([fmt(row) + "\n" for row in rows]))
+
+    def _format_color(self, row: LiqRow) -> str:
+        side = row.side or ""
+        color = self._side_color.get(side) or self._side_color.get(side.lower(), "")
+        return (
+            f"[{row.exchange}/{row.market}] {row.symbol} | "
+            f"{(color + side + self.CLR_RST) if color else side} | "
+            f"qty={row.qty} @ {row.price} "
+            f"({self.CLR_DIM}notional={row.notional}{self.CLR_RST})"
+        )
+
+    def _format_plain(self, row: LiqRow) -> str:
+        # same line as _format_color minus the escapes, built directly
+        return (
+            f"[{row.exchange}/{row.market}] {row.symbol} | {row.side or ''} | "
+            f"qty={row.qty} @ {row.price} (notional={row.notional})"
+        )
 
 
 def _resolve_streams(args) -> List[Tuple[str, str]]:
@@ -119,31 +269,35 @@ def _resolve_streams(args) -> List[Tuple[str, str]]:
             print("[hyperliquid] Warning: overriding --market to 'usdc' (Hyperliquid is USDC).")
             mk = "usdc"
         pairs = [(ex, mk)]
-    return pairs
+    # split()/lower() hand back fresh strings; intern them so every stream,
+    # sink key and adapter shares the same exchange/market objects
+    return [(sys.intern(ex), sys.intern(mk)) for ex, mk in pairs]
 
 
 def _outdir_for(ex: str, mk: str, args) -> str:
     return args.outdir or os.path.join(args.outdir_root, f"{ex}_{mk}")
 
 
-async def _run_one(ex: str, mk: str, args, pg_writer: Optional[PostgresWriter]):
+async def _run_one(ex: str, mk: str, args, pg_writer: Optional["PostgresWriter"],
+                   csv_sink: Optional[CSVSink]):
+    from adapters import get_adapter
+
     outdir = _outdir_for(ex, mk, args)
-    csv_writer = None
-    if args.sink in ("csv", "both") and not args.no_write:
-        os.makedirs(outdir, exist_ok=True)
-        csv_writer = CSVWriter(outdir)
+    csv_writer = csv_sink.writer(ex, mk, outdir) if csv_sink else None
 
     writer = WriterShim(
         outdir=outdir,
         print_colors=not args.no_color,
         no_write=args.no_write,
         csv_writer=csv_writer,
-        pg_writer=pg_writer if (args.sink in ("pg", "both") and not args.no_write) else None
+        pg_writer=pg_writer if args.pg_enabled else None
     )
 
     Adapter = get_adapter(ex)
     if ex == "bybit":
-        adapter = Adapter(writer=writer, market=mk, symbols=None, subscribe_chunk=max(1, args.subscribe_chunk))
+        # raw is only stored by the CSV/PG sinks; print-only runs skip building it
+        adapter = Adapter(writer=writer, market=mk, symbols=None, subscribe_chunk=max(1, args.subscribe_chunk),
+                          emit_raw=args.csv_enabled or args.pg_enabled)
     elif ex == "hyperliquid":
         # File-based adapter: pass root_dir & catch_up options
         hl_root = args.hl_root or str(Path.home() / "hl" / "data" / "node_fills_streaming" / "hourly")
@@ -163,33 +317,58 @@ async def _run_one(ex: str, mk: str, args, pg_writer: Optional[PostgresWriter]):
         adapter = Adapter(writer=writer, market=mk)
 
     print(f"[{ex}/{mk}] starting ? {outdir} @ {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}")
-    await adapter.run()
+    try:
+        await adapter.run()
+    finally:
+        writer.close()
 
 
 async def run_all(args):
     # Init a shared PG writer if needed
     pg_writer = None
-    if args.sink in ("pg", "both") and not args.no_write:
+    if args.pg_enabled:
         if not args.pg_dsn:
             raise SystemExit("Postgres sink requested but --pg-dsn not provided (or PG_DSN env).")
+        from writer_pg import PostgresWriter
         pg_writer = await PostgresWriter.create(
             dsn=args.pg_dsn,
             table_name=args.pg_table,
             batch_size=args.pg_batch,
             flush_interval=args.pg_interval,
+            queue_capacity=args.pg_queue or None,
+            shards=max(1, args.pg_shards),
+            encode_in_thread=args.pg_encode_thread,
+            partition=args.pg_partition,
+            unlogged=args.pg_unlogged,
+            async_commit=args.pg_async_commit,
+            overflow_policy=args.pg_overflow,
         )
 
+    # One CSV sink for all streams: a file per (exchange, market), one flush thread
+    csv_sink = None
+    if args.csv_enabled:
+        csv_sink = CSVSink()
+
     try:
         pairs = _resolve_streams(args)
-        tasks = [asyncio.create_task(_run_one(ex, mk, args, pg_writer)) for ex, mk in pairs]
+        tasks = [asyncio.create_task(_run_one(ex, mk, args, pg_writer, csv_sink)) for ex, mk in pairs]
         await asyncio.gather(*tasks)
     finally:
+        if csv_sink:
+            csv_sink.close()
         if pg_writer:
             await pg_writer.aclose()
 
 
 def main():
     args = parse_args()
+    # adapters log via `logging`; keep the plain one-line-per-message look of print()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        import uvloop  # optional (not on Windows): faster event loop for the WS/IO paths
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     try:
         asyncio.run(run_all(args))
     except KeyboardInterrupt:
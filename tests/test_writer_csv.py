@@ -0,0 +1,63 @@
+# tests/test_writer_csv.py
+import csv
+import io
+import random
+import unittest
+
+from schema import LiqRow
+from writer_csv import SCHEMA, _csv_lines
+
+
+def _reference(rows) -> str:
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\r\n")
+    for r in rows:
+        w.writerow([getattr(r, c) for c in SCHEMA])
+    return buf.getvalue()
+
+
+class CsvLinesTest(unittest.TestCase):
+    def assertMatchesCsvWriter(self, rows):
+        self.assertEqual(_csv_lines(rows), _reference(rows))
+
+    def test_raw_needing_quotes(self):
+        raws = ['{"a":1}', 'x,y', 'line\nbreak', 'cr\rhere', 'crlf\r\n', '""', '"', "plain", " lead"]
+        self.assertMatchesCsvWriter([
+            LiqRow("bybit", "usdt", "BTCUSDT", "long", 1.0, 2.0, 2.0, 1, 2, raw) for raw in raws
+        ])
+
+    def test_empty_and_none(self):
+        self.assertMatchesCsvWriter([
+            LiqRow("okx", "coin", "", "", 0.0, 0.0, 0.0, None, 5, None),
+            LiqRow("okx", "coin", "X", None, None, None, None, None, None, ""),
+        ])
+
+    def test_float_repr(self):
+        floats = [0.1 + 0.2, 1e-7, 1e16, 123456789.123456789, -0.0, 30000.0, float("inf")]
+        self.assertMatchesCsvWriter([
+            LiqRow("binance", "usdt", "S", "short", f, f, f * 3, 1710000000123, 1710000000456, "{}")
+            for f in floats
+        ])
+
+    def test_randomized(self):
+        rnd = random.Random(1234)
+        alphabet = 'ab ,"\r\n{}:\\é'
+
+        def text():
+            if rnd.random() < 0.1:
+                return None
+            return "".join(rnd.choice(alphabet) for _ in range(rnd.randrange(0, 12)))
+
+        def num():
+            return None if rnd.random() < 0.1 else rnd.uniform(-1e6, 1e6)
+
+        rows = [
+            LiqRow(text(), text(), text(), text(), num(), num(), num(),
+                   rnd.choice([None, rnd.randrange(1 << 44)]), rnd.randrange(1 << 44), text())
+            for _ in range(2000)
+        ]
+        self.assertMatchesCsvWriter(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
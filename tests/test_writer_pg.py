@@ -0,0 +1,117 @@
+# tests/test_writer_pg.py
+import asyncio
+import contextlib
+import struct
+import time
+import unittest
+from unittest import mock
+
+from schema import LiqRow
+from writer_pg import PostgresWriter, _encode_copy_binary
+
+
+def _row(i: int) -> LiqRow:
+    return LiqRow("binance", "usdt", "BTCUSDT", "long", 1.0, 2.0, 2.0, i, 1, "{}")
+
+
+class RunLoopTest(unittest.TestCase):
+    def test_burst_sends_next_full_batch_when_inflight_flush_ends(self):
+        async def main():
+            w = PostgresWriter(pool=None, batch_size=100, flush_interval=1.0)
+            sent = []
+
+            async def fake_flush(sh, sql, batch):
+                sent.append((time.perf_counter(), len(batch)))
+                await asyncio.sleep(0.05)
+
+            w._flush = fake_flush
+            for sh in w._shards:
+                sh.task = asyncio.create_task(w._run(sh))
+            t0 = time.perf_counter()
+            for i in range(200):
+                w.write_row(_row(i))
+            await asyncio.sleep(0.3)
+
+            w._stop.set()
+            for sh in w._shards:
+                sh.has_data.set()
+            await asyncio.gather(*[sh.task for sh in w._shards])
+            return t0, sent
+
+        t0, sent = asyncio.run(main())
+        self.assertEqual([n for _, n in sent], [100, 100])
+        # second batch follows the first flush (~50 ms), not flush_interval
+        self.assertLess(sent[1][0] - t0, 0.2)
+
+
+class CopyBinaryTest(unittest.TestCase):
+    def test_none_raw_is_sql_null(self):
+        rec = ("binance", "usdt", "BTCUSDT", "long", 1.0, 2.0, 2.0, 1, 1, None)
+        data = _encode_copy_binary([rec])
+        # the jsonb column is the last field before the int16 -1 trailer
+        self.assertEqual(data[-6:], struct.pack("!ih", -1, -1))
+
+    def test_raw_text_is_jsonb(self):
+        rec = ("binance", "usdt", "BTCUSDT", "long", 1.0, 2.0, 2.0, 1, 1, '{"a":1}')
+        data = _encode_copy_binary([rec])
+        self.assertTrue(data.endswith(struct.pack("!i", 8) + b'\x01{"a":1}' + struct.pack("!h", -1)))
+
+
+class _Conn:
+    def __init__(self, partitioned: bool):
+        self.partitioned = partitioned
+        self.executed = []
+
+    async def execute(self, sql, *args):
+        self.executed.append(sql)
+
+    async def fetchval(self, sql, *args):
+        return self.partitioned
+
+
+class _Pool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+class EnsureTableTest(unittest.TestCase):
+    def _ensure(self, partitioned: bool):
+        conn = _Conn(partitioned)
+        w = PostgresWriter(pool=_Pool(conn), table_name="public.liq", partition=True)
+        with self.assertLogs("writer_pg", "WARNING") if not partitioned else contextlib.nullcontext():
+            asyncio.run(w._ensure_table())
+        return w, conn
+
+    def test_existing_plain_table_disables_partitioning(self):
+        w, conn = self._ensure(partitioned=False)
+        self.assertFalse(w.partition)
+        self.assertFalse(any("PARTITION OF" in sql for sql in conn.executed))
+
+    def test_partitioned_table_gets_default_partition(self):
+        w, conn = self._ensure(partitioned=True)
+        self.assertTrue(w.partition)
+        self.assertTrue(any("public.liq_default PARTITION OF public.liq" in sql for sql in conn.executed))
+
+
+class CreatePoolSizeTest(unittest.TestCase):
+    def test_pool_fits_rounded_shard_count(self):
+        async def main():
+            pool = mock.AsyncMock()
+            with mock.patch("writer_pg.asyncpg.create_pool", mock.AsyncMock(return_value=pool)) as cp:
+                w = await PostgresWriter.create(
+                    "postgres://x", create_table=False, create_indexes=False, shards=9,
+                )
+                await w.aclose()
+            return w, cp.call_args.kwargs["max_size"]
+
+        w, max_size = asyncio.run(main())
+        self.assertEqual(len(w._shards), 16)
+        self.assertGreaterEqual(max_size, len(w._shards) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
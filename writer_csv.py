@@ -1,39 +1,187 @@
 # writer_csv.py
 
-import csv
+import atexit
 import os
+import threading
+import time
 from datetime import datetime, timezone
+from operator import attrgetter
+
+from schema import LiqRow
 
 SCHEMA = [
     "exchange","market","symbol","side","qty","price","notional",
     "ts_exch_ms","ts_ingest_ms","raw"
 ]
 
+_UTC = timezone.utc
+_DAY = 86400
+
+# row -> tuple in SCHEMA order, in one C call (no per-row dict for DictWriter)
+_row_values = attrgetter(*SCHEMA)
+
+_HEADER = (",".join(SCHEMA) + "\r\n").encode("utf-8")
+
+
+def _q(v) -> str:
+    # csv.QUOTE_MINIMAL for a text field: quote only if it holds a delimiter,
+    # quote or line break, doubling embedded quotes
+    if v is None:
+        return ""
+    if '"' in v or "," in v or "\n" in v or "\r" in v:
+        return '"' + v.replace('"', '""') + '"'
+    return v
+
+
+def _n(v) -> str:
+    return "" if v is None else str(v)
+
+
+def _csv_lines(rows) -> str:
+    """
+    Format rows exactly as csv.writer (excel dialect) would, without its
+    per-field dispatch: the numeric columns never need quoting, so only the
+    text columns go through _q.
+    """
+    return "".join([
+        f"{_q(ex)},{_q(mk)},{_q(sym)},{_q(side)},{_n(qty)},{_n(px)},{_n(notional)},"
+        f"{_n(ts_exch)},{_n(ts_ingest)},{_q(raw)}\r\n"
+        for ex, mk, sym, side, qty, px, notional, ts_exch, ts_ingest, raw in map(_row_values, rows)
+    ])
+
 class CSVWriter:
-    def __init__(self, outdir: str):
+    """
+    Daily CSV file per stream. Lines are formatted into an in-memory buffer
+    and written with one os.write() once it holds `flush_bytes`, or when it
+    is `flush_interval` seconds old (a small daemon thread covers quiet
+    periods, unless a CSVSink drives flush_if_stale for it). flush()/close()
+    drain it; close() also runs at exit.
+    """
+
+    def __init__(self, outdir: str, flush_bytes: int = 64 * 1024, flush_interval: float = 0.25,
+                 flusher: bool = True):
         self.outdir = outdir
+        self.flush_bytes = max(1, int(flush_bytes))
+        self.flush_interval = float(flush_interval)
+
+        self._buf = bytearray()
+        self._lock = threading.Lock()  # writes come from the loop, timed flushes from the thread
+        self._last_flush = time.monotonic()
+        self._fd = None
         self._open_for_today()
 
-    def _today_fname(self):
-        d = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        atexit.register(self.close)
+        if flusher:
+            threading.Thread(target=self._flush_loop, name="csv-flush", daemon=True).start()
+
+    def _today_fname(self, now: float):
+        d = datetime.fromtimestamp(now, _UTC).strftime("%Y-%m-%d")
         return os.path.join(self.outdir, f"liquidations_{d}.csv")
 
     def _open_for_today(self):
-        self.current_path = self._today_fname()
-        self._f = open(self.current_path, "a", newline="", encoding="utf-8")
-        self._w = csv.DictWriter(self._f, fieldnames=SCHEMA)
-        if os.stat(self.current_path).st_size == 0:
-            self._w.writeheader()
+        now = time.time()
+        self.current_path = self._today_fname(now)
+        # next UTC midnight; writes only compare a float against it
+        self._next_rollover = (now // _DAY + 1) * _DAY
+        self._fd = os.open(self.current_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        # O_APPEND leaves the offset at 0; seeking to the end gives the size
+        # without building a stat result
+        if os.lseek(self._fd, 0, os.SEEK_END) == 0:
+            self._buf += _HEADER
 
     def _rotate_if_needed(self):
-        if self.current_path != self._today_fname():
-            self._f.close()
+        if time.time() >= self._next_rollover:
+            # buffered lines belong to the old day's file
+            self._flush_locked()
+            os.close(self._fd)
             self._open_for_today()
 
-    def write_row(self, row: dict):
-        self._rotate_if_needed()
-        # only keep known keys
-        safe = {k: row.get(k, "") for k in SCHEMA}
-        self._w.writerow(safe)
-        # flush reasonably quickly for safety
-        self._f.flush()
+    def _flush_locked(self):
+        if self._buf and self._fd is not None:
+            view = memoryview(self._buf)
+            while view:
+                n = os.write(self._fd, view)
+                view = view[n:]
+            view.release()
+            self._buf.clear()
+        self._last_flush = time.monotonic()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush_if_stale()
+
+    def flush_if_stale(self):
+        """Write out buffered lines older than flush_interval (timer hook)."""
+        try:
+            with self._lock:
+                if self._buf and time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._flush_locked()
+        except Exception as e:
+            print(f"[csv] flush error ({self.current_path}): {e}")
+
+    def write_row(self, row: LiqRow):
+        self.write_rows((row,))
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        with self._lock:
+            if self._fd is None:
+                return  # closed
+            self._rotate_if_needed()
+            self._buf += _csv_lines(rows).encode("utf-8")
+            if len(self._buf) >= self.flush_bytes or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            if self._fd is None:
+                return
+            self._flush_locked()
+            os.close(self._fd)
+            self._fd = None
+
+
+class CSVSink:
+    """
+    Process-wide owner of the CSV writers: one CSVWriter per
+    (exchange, market), all driven by a single timed-flush thread instead
+    of one thread per file.
+    """
+
+    def __init__(self, flush_bytes: int = 64 * 1024, flush_interval: float = 0.25):
+        self.flush_bytes = flush_bytes
+        self.flush_interval = float(flush_interval)
+        self._writers = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self._flush_loop, name="csv-flush", daemon=True).start()
+
+    def writer(self, exchange: str, market: str, outdir: str) -> CSVWriter:
+        key = (exchange, market)
+        with self._lock:
+            w = self._writers.get(key)
+            if w is None:
+                os.makedirs(outdir, exist_ok=True)
+                w = CSVWriter(outdir, flush_bytes=self.flush_bytes,
+                              flush_interval=self.flush_interval, flusher=False)
+                self._writers[key] = w
+            return w
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            with self._lock:
+                writers = list(self._writers.values())
+            for w in writers:
+                w.flush_if_stale()
+
+    def close(self):
+        with self._lock:
+            writers = list(self._writers.values())
+        for w in writers:
+            w.close()
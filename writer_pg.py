@@ -1,11 +1,24 @@
 # writer_pg.py
 import asyncio
 import json
+import logging
+import struct
 import time
-from typing import Optional, Sequence, Dict, Any
+from collections import deque
+from datetime import datetime, timezone
+from operator import attrgetter
+from typing import Any, Dict, Optional, Sequence, Tuple
 
 import asyncpg
 
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json works the same, just slower
+    orjson = None
+
+from schema import LiqRow
+
+log = logging.getLogger(__name__)
 
 SCHEMA_COLS = [
     "exchange",        # text
@@ -21,7 +34,7 @@ SCHEMA_COLS = [
 ]
 
 CREATE_TABLE_SQL = """
-CREATE TABLE IF NOT EXISTS {table_name} (
+CREATE {unlogged}TABLE IF NOT EXISTS {table_name} (
     exchange     TEXT NOT NULL,
     market       TEXT NOT NULL,
     symbol       TEXT NOT NULL,
@@ -32,7 +45,17 @@ CREATE TABLE IF NOT EXISTS {table_name} (
     ts_exch_ms   BIGINT,
     ts_ingest_ms BIGINT,
     raw          JSONB
-);
+){partition_by};
+"""
+
+# monthly range partitions on ts_exch_ms (partition=True); rows without an
+# exchange timestamp land in the DEFAULT partition
+PARTITION_BY_SQL = " PARTITION BY RANGE (ts_exch_ms)"
+IS_PARTITIONED_SQL = "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass($1))"
+CREATE_DEFAULT_PARTITION_SQL = "CREATE TABLE IF NOT EXISTS {table_name}_default PARTITION OF {table_name} DEFAULT"
+CREATE_PARTITION_SQL = """
+CREATE TABLE IF NOT EXISTS {table_name}_{suffix} PARTITION OF {table_name}
+FOR VALUES FROM ({lo}) TO ({hi})
 """
 
 CREATE_INDEX_SQL = """
@@ -56,20 +79,152 @@ BEGIN
 END$$;
 """
 
+# row -> tuple in SCHEMA_COLS order (the COPY/INSERT record), in one C call
+_row_values = attrgetter(*SCHEMA_COLS)
+
 INSERT_SQL = """
 INSERT INTO {table_name} ({cols})
 VALUES ({placeholders})
 """
 
+# what write_row does when a shard's queue is full; there is no blocking
+# policy because write_row runs on the event loop that would drain it
+OVERFLOW_POLICIES = ("drop_oldest", "drop_new")
+
+def _month_bounds(ts_ms: int) -> Tuple[int, int, str]:
+    """[start, end) of ts_ms's UTC month in epoch ms, plus its YYYYMM suffix."""
+    d = datetime.fromtimestamp(ts_ms / 1000, timezone.utc)
+    lo = datetime(d.year, d.month, 1, tzinfo=timezone.utc)
+    hi = datetime(d.year + d.month // 12, d.month % 12 + 1, 1, tzinfo=timezone.utc)
+    return int(lo.timestamp()) * 1000, int(hi.timestamp()) * 1000, f"{d.year:04d}{d.month:02d}"
+
 def _now_ms() -> int:
-    return int(time.time() * 1000)
+    return time.time_ns() // 1_000_000
+
+def _shard_count(shards: int) -> int:
+    """shards rounded up to a power of two, so a hash & mask picks one."""
+    n = 1
+    while n < shards:
+        n <<= 1
+    return n
+
+
+def _json_dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+
+if orjson is not None:
+    def _dumpb(obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:  # e.g. non-str dict keys; stdlib json accepts more
+            return _json_dumps(obj).encode()
+
+    _json_loads = orjson.loads
+else:
+    def _dumpb(obj: Any) -> bytes:
+        return _json_dumps(obj).encode()
+
+    _json_loads = json.loads
+
+
+def _encode_jsonb(v: Any) -> bytes:
+    # binary jsonb = version byte 1 + JSON text. `raw` arrives either as
+    # JSON text already or as the parsed event, which is serialized here on
+    # the flush task instead of on the producer; orjson's bytes go straight
+    # in, with no str round trip
+    if v.__class__ is str:
+        return b"\x01" + v.encode()
+    try:
+        return b"\x01" + _dumpb(v)
+    except Exception:
+        return b"\x01{}"
+
+
+def _decode_jsonb(b: bytes) -> Any:
+    return _json_loads(b[1:])
+
+
+# COPY ... (FORMAT binary) framing for SCHEMA_COLS:
+# text x4, float8 x3, int8 x2, jsonb
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_COPY_TRAILER = struct.pack("!h", -1)
+_NCOLS = struct.pack("!h", len(SCHEMA_COLS))
+_NULL = struct.pack("!i", -1)
+_F8 = struct.Struct("!id").pack   # length 8 + value
+_I8 = struct.Struct("!iq").pack
+_LEN = struct.Struct("!i").pack
+
+
+def _encode_copy_binary(batch) -> bytes:
+    """
+    Encode a batch of SCHEMA_COLS records as one binary COPY stream. Runs
+    in a worker thread so a large batch doesn't hold the event loop.
+    """
+    parts = [_COPY_HEADER]
+    append = parts.append
+    for exchange, market, symbol, side, qty, price, notional, ts_exch, ts_ingest, raw in batch:
+        append(_NCOLS)
+        for t in (exchange, market, symbol, side):
+            if t is None:
+                append(_NULL)
+            else:
+                b = t.encode()
+                append(_LEN(len(b)))
+                append(b)
+        for f in (qty, price, notional):
+            append(_NULL if f is None else _F8(8, f))
+        for i in (ts_exch, ts_ingest):
+            append(_NULL if i is None else _I8(8, int(i)))
+        if raw is None:
+            append(_NULL)  # SQL NULL, as copy_records_to_table/INSERT store it
+        else:
+            j = _encode_jsonb(raw)
+            append(_LEN(len(j)))
+            append(j)
+    append(_COPY_TRAILER)
+    return b"".join(parts)
+
+
+async def _init_conn(conn: asyncpg.Connection):
+    await conn.set_type_codec(
+        "jsonb", encoder=_encode_jsonb, decoder=_decode_jsonb,
+        schema="pg_catalog", format="binary",
+    )
+
+
+class _Shard:
+    """One flush lane: its own row buffer, wakeup, connection and task."""
+
+    __slots__ = ("buf", "has_data", "conn", "insert_stmt", "task")
+
+    def __init__(self, capacity: int):
+        # producer -> flush task hand-off: both run on the event loop, so a
+        # deque plus a wakeup Event is enough (no asyncio.Queue futures/locks);
+        # maxlen makes append() drop the oldest row when full
+        self.buf: "deque[Tuple[Any, ...]]" = deque(maxlen=capacity)
+        self.has_data = asyncio.Event()
+        self.conn: Optional[asyncpg.Connection] = None  # owned by the shard's _run
+        self.insert_stmt = None  # INSERT fallback, prepared once on conn
+        self.task: Optional[asyncio.Task] = None
 
 
 class PostgresWriter:
     """
     Async, batched Postgres writer using asyncpg.
-    - Queue + background task to batch inserts
+    - write_row appends to a per-shard deque and sets an asyncio.Event that
+      wakes that shard's background flush task, which batches the rows
     - Shared across all streams
+    - The flush task holds one pooled connection for its lifetime
+      (re-acquired after an error) instead of acquiring per batch
+    - Bounded buffer (queue_capacity, default 10x batch_size): when Postgres
+      falls behind, overflow_policy picks what is lost: "drop_oldest" (the
+      deque's maxlen evicts the oldest rows) or "drop_new" (the incoming
+      row is refused and write_row returns False); both count `dropped`
+    - shards > 1 (rounded up to a power of two) splits rows by symbol hash
+      over that many flush tasks, each with its own connection, so COPYs
+      overlap; each shard gets the full queue_capacity, since a few hot
+      symbols can put most rows on one shard
     """
 
     def __init__(
@@ -80,7 +235,17 @@ class PostgresWriter:
         flush_interval: float = 1.0,
         create_table: bool = True,
         create_indexes: bool = True,
+        queue_capacity: Optional[int] = None,
+        shards: int = 1,
+        encode_in_thread: bool = False,
+        partition: bool = False,
+        unlogged: bool = False,
+        overflow_policy: str = "drop_oldest",
     ):
+        if partition and unlogged:
+            raise ValueError("partitioned tables can't be UNLOGGED; pick one of partition/unlogged")
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}, got {overflow_policy!r}")
         self.pool = pool
         self.table_name = table_name
         self.batch_size = max(1, batch_size)
@@ -88,9 +253,41 @@ class PostgresWriter:
         self.create_table = create_table
         self.create_indexes = create_indexes
 
-        self._queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=50_000)
-        self._task: Optional[asyncio.Task] = None
+        self.queue_capacity = max(1, queue_capacity or 10 * self.batch_size)
+        n = _shard_count(shards)
+        self._shard_mask = n - 1  # hash & mask picks the shard
+        self._shards = [_Shard(self.queue_capacity) for _ in range(n)]
+        # on a full shard: "drop_oldest" keeps the new row and evicts the
+        # oldest queued one; "drop_new" rejects the new row (write_row -> False)
+        self.overflow_policy = overflow_policy
+        self._drop_new = overflow_policy == "drop_new"
+        self._hwm = max(1, int(0.8 * self.queue_capacity))
+        self.dropped = 0            # rows discarded on overflow since start
+        self._dropped_logged = 0    # `dropped` at the last warning
+        self._drop_warn_at = 0.0    # monotonic time of the last warning
+        self._err_count = 0         # flush errors since start (_warn_limited)
+        self._err_logged = 0        # `_err_count` at the last report
+        self._err_log_at = -1.0     # monotonic time of the last report
         self._stop = asyncio.Event()
+        # build the binary COPY payload in a worker thread (see _insert)
+        self.encode_in_thread = encode_in_thread
+        # monthly partitions (new tables only): YYYYMM suffixes known to
+        # exist, and the last month seen, which most rows fall into
+        self.partition = partition
+        self._partitions: set = set()
+        self._part_range = (0, 0)
+        self._part_lock = asyncio.Lock()
+        # UNLOGGED: no WAL for the table (fast, but emptied after a crash)
+        self.unlogged = unlogged
+        # (schema or None, table) for copy_records_to_table, split once
+        schema, _, table = table_name.rpartition(".")
+        self._table_parts = (schema or None, table)
+        # INSERT fallback statement; fixed for the writer's lifetime
+        self._cols = ", ".join(SCHEMA_COLS)
+        self._placeholders = ", ".join(f"${i+1}" for i in range(len(SCHEMA_COLS)))
+        self._insert_sql = INSERT_SQL.format(
+            table_name=table_name, cols=self._cols, placeholders=self._placeholders,
+        )
 
     @classmethod
     async def create(
@@ -103,8 +300,25 @@ class PostgresWriter:
         create_indexes: bool = True,
         min_size: int = 1,
         max_size: int = 10,
+        queue_capacity: Optional[int] = None,
+        shards: int = 1,
+        encode_in_thread: bool = False,
+        partition: bool = False,
+        unlogged: bool = False,
+        async_commit: bool = False,
+        overflow_policy: str = "drop_oldest",
     ) -> "PostgresWriter":
-        pool = await asyncpg.create_pool(dsn=dsn, min_size=min_size, max_size=max_size)
+        # async_commit: COPYs return before their WAL is flushed; a server
+        # crash can lose the last moments of rows, but never corrupts data
+        server_settings = {"synchronous_commit": "off"} if async_commit else None
+        # each shard holds a connection for its lifetime; leave room for DDL.
+        # Size from the rounded count __init__ will use, or the extra shards
+        # would wait forever in pool.acquire()
+        shards = _shard_count(shards)
+        pool = await asyncpg.create_pool(
+            dsn=dsn, min_size=min_size, max_size=max(max_size, shards + 1), init=_init_conn,
+            server_settings=server_settings,
+        )
         self = cls(
             pool=pool,
             table_name=table_name,
@@ -112,18 +326,68 @@ class PostgresWriter:
             flush_interval=flush_interval,
             create_table=create_table,
             create_indexes=create_indexes,
+            queue_capacity=queue_capacity,
+            shards=shards,
+            encode_in_thread=encode_in_thread,
+            partition=partition,
+            unlogged=unlogged,
+            overflow_policy=overflow_policy,
         )
         if create_table:
             await self._ensure_table()
         if create_indexes:
             await self._ensure_indexes()
-        self._task = asyncio.create_task(self._run())
+        for sh in self._shards:
+            sh.task = asyncio.create_task(self._run(sh))
         return self
 
     async def _ensure_table(self):
-        sql = CREATE_TABLE_SQL.format(table_name=self.table_name)
+        sql = CREATE_TABLE_SQL.format(
+            table_name=self.table_name,
+            unlogged="UNLOGGED " if self.unlogged else "",
+            partition_by=PARTITION_BY_SQL if self.partition else "",
+        )
         async with self.pool.acquire() as conn:
             await conn.execute(sql)
+            if self.partition:
+                # CREATE TABLE IF NOT EXISTS leaves an existing plain table as is,
+                # and attaching partitions to it would fail on every batch.
+                if not await conn.fetchval(IS_PARTITIONED_SQL, self.table_name):
+                    log.warning("[postgres] %s exists and is not partitioned; partition management "
+                                "disabled (migrate it to a partitioned table or use a new --pg-table)",
+                                self.table_name)
+                    self.partition = False
+                    return
+                await conn.execute(CREATE_DEFAULT_PARTITION_SQL.format(table_name=self.table_name))
+
+    async def _ensure_partitions(self, conn: asyncpg.Connection, batch):
+        """Create any missing monthly partitions for the batch before it's copied."""
+        lo, hi = self._part_range
+        missing = {}
+        for rec in batch:
+            ts = rec[7]  # ts_exch_ms
+            if ts is None or lo <= ts < hi:
+                continue
+            m_lo, m_hi, suffix = _month_bounds(ts)
+            if suffix not in self._partitions:
+                missing[suffix] = (m_lo, m_hi)
+            lo, hi = m_lo, m_hi
+        if not missing:
+            self._part_range = (lo, hi)
+            return
+        async with self._part_lock:  # shards may race for the same month
+            for suffix, (m_lo, m_hi) in sorted(missing.items()):
+                if suffix in self._partitions:
+                    continue
+                try:
+                    await conn.execute(CREATE_PARTITION_SQL.format(
+                        table_name=self.table_name, suffix=suffix, lo=m_lo, hi=m_hi,
+                    ))
+                except asyncpg.DuplicateTableError:
+                    pass  # created concurrently by another writer process
+                self._partitions.add(suffix)
+        # only cache the fast-path range once its partition is known to exist
+        self._part_range = (lo, hi)
 
     async def _ensure_indexes(self):
         idx_time = (self.table_name.split(".")[-1]) + "_ts_idx"
@@ -136,89 +400,201 @@ class PostgresWriter:
         async with self.pool.acquire() as conn:
             await conn.execute(sql)
 
-    def write_row(self, row: Dict[str, Any]):
+    def write_row(self, row: LiqRow) -> bool:
         """
         Adapters call this synchronously. We enqueue for async batch writing.
+        Returns False if the row was dropped (overflow_policy="drop_new").
         """
+        # Project straight to the COPY record (SCHEMA_COLS order); fill defaults
+        (exchange, market, symbol, side, qty, price, notional,
+         ts_exch_ms, ts_ingest_ms, raw) = _row_values(row)
+        if ts_ingest_ms is None:
+            ts_ingest_ms = _now_ms()
+
+        # raw may stay a parsed object: the jsonb codec serializes it at flush
+        safe = (exchange, market, symbol, side, qty, price, notional, ts_exch_ms, ts_ingest_ms, raw)
+        sh = self._shards[hash(symbol) & self._shard_mask]
+        buf = sh.buf
+        if len(buf) >= self.queue_capacity:
+            # full: drop this row, or let append() below evict the oldest
+            self.dropped += 1
+            now = time.monotonic()
+            if now - self._drop_warn_at >= 5.0:
+                log.warning("[postgres] queue full (%d); dropped %d rows (total %d)",
+                            self.queue_capacity, self.dropped - self._dropped_logged, self.dropped)
+                self._drop_warn_at = now
+                self._dropped_logged = self.dropped
+            if self._drop_new:
+                return False
+        buf.append(safe)
+        sh.has_data.set()
+        return True
+
+    def write_rows(self, rows) -> int:
+        """Enqueue a batch; returns how many rows were accepted."""
+        write_row = self.write_row
+        return sum([write_row(row) for row in rows])
+
+    def is_backpressured(self) -> bool:
+        """True once any shard is past its high-water mark (80% of queue_capacity)."""
+        hwm = self._hwm
+        return any(len(sh.buf) >= hwm for sh in self._shards)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Counters for monitoring: rows dropped on overflow, rows waiting to flush."""
+        return {
+            "dropped": self.dropped,
+            "qlen": sum(len(sh.buf) for sh in self._shards),
+        }
+
+    async def aclose(self):
+        self._stop.set()
+        for sh in self._shards:
+            sh.has_data.set()  # wake idle shards so they see the stop
+        await asyncio.gather(*[sh.task for sh in self._shards if sh.task])
+        await self.pool.close()
+
+    async def _insert(self, sh: _Shard, sql: str, batch):
+        if sh.conn is None:
+            sh.conn = await self.pool.acquire()
+        schema, table = self._table_parts
         try:
-            # Ensure required cols exist; fill defaults
-            safe = {k: row.get(k) for k in SCHEMA_COLS}
-            if safe["ts_ingest_ms"] is None:
-                safe["ts_ingest_ms"] = _now_ms()
-
-            # Always ensure raw is JSON string
-            raw = safe.get("raw")
-            if isinstance(raw, dict):
-                safe["raw"] = json.dumps(raw, separators=(",", ":"))
-            elif not isinstance(raw, str):
-                try:
-                    safe["raw"] = json.dumps(raw, separators=(",", ":"))
-                except Exception:
-                    safe["raw"] = "{}"
+            if self.partition:
+                await self._ensure_partitions(sh.conn, batch)
+            try:
+                # binary COPY: the whole batch in one protocol stream
+                if self.encode_in_thread:
+                    data = await asyncio.get_running_loop().run_in_executor(
+                        None, _encode_copy_binary, batch,
+                    )
+                    # memoryview: asyncpg treats a plain bytes source as a file path
+                    await sh.conn.copy_to_table(
+                        table, source=memoryview(data), columns=SCHEMA_COLS,
+                        schema_name=schema, format="binary",
+                    )
+                else:
+                    await sh.conn.copy_records_to_table(
+                        table, records=batch, columns=SCHEMA_COLS, schema_name=schema,
+                    )
+            except asyncpg.PostgresConnectionError:
+                raise
+            except asyncpg.PostgresError as e:
+                # server refused the COPY (e.g. a pooler or permissions that
+                # don't allow it); retry the batch as plain INSERTs
+                self._warn_limited("[postgres] COPY failed (%s); retrying %d rows with INSERT", e, len(batch))
+                if sh.insert_stmt is None:
+                    sh.insert_stmt = await sh.conn.prepare(sql)
+                # one explicit transaction = one commit for the batch
+                # (COPY above is already a single statement/commit)
+                async with sh.conn.transaction(isolation="read_committed"):
+                    await sh.insert_stmt.executemany(batch)
+        except (asyncpg.PostgresConnectionError, asyncpg.InterfaceError, OSError):
+            # connection is gone (e.g. ConnectionDoesNotExistError); drop it
+            # and its prepared statement so the next batch gets a fresh one
+            await self._release_conn(sh)
+            raise
 
-            self._queue.put_nowait(safe)
-        except asyncio.QueueFull:
-            # Drop oldest if queue is full
+    async def _release_conn(self, sh: _Shard):
+        conn, sh.conn = sh.conn, None
+        sh.insert_stmt = None
+        if conn is not None:
             try:
-                _ = self._queue.get_nowait()
-                self._queue.put_nowait(safe)
+                await self.pool.release(conn)
             except Exception:
                 pass
 
-    async def aclose(self):
-        self._stop.set()
-        if self._task:
-            await self._task
-        await self.pool.close()
+    async def _flush(self, sh: _Shard, sql: str, batch):
+        try:
+            await self._insert(sh, sql, batch)
+        except Exception as e:
+            self._warn_limited("[postgres] insert error (%d rows): %s", len(batch), e)
 
-    async def _run(self):
+    def _warn_limited(self, msg: str, *args):
+        """
+        log.warning, at most once a second (and on every 1000th call), with
+        the number of suppressed messages appended, so an outage that fails
+        every batch can't flood the log from the flush loop.
         """
-        Background flush loop:
+        self._err_count += 1
+        now = time.monotonic()
+        if now - self._err_log_at < 1.0 and self._err_count % 1000:
+            return
+        suppressed = self._err_count - self._err_logged - 1
+        if suppressed:
+            log.warning(msg + " (+%d similar since last report)", *args, suppressed)
+        else:
+            log.warning(msg, *args)
+        self._err_log_at = now
+        self._err_logged = self._err_count
+
+    async def _run(self, sh: _Shard):
+        """
+        Background flush loop (one per shard):
         - Pull items from queue
-        - Batch INSERT at intervals or when batch is full
+        - COPY the batch at intervals or when batch is full
+          (INSERT fallback if the server rejects COPY)
+        - At most one flush in flight: rows keep accumulating while it
+          runs and go out together once it completes, so the batch grows
+          with the arrival rate instead of queueing behind fixed-size ones
         """
-        cols = ", ".join(SCHEMA_COLS)
-        placeholders = ", ".join(f"${i+1}" for i in range(len(SCHEMA_COLS)))
-        sql = INSERT_SQL.format(table_name=self.table_name, cols=cols, placeholders=placeholders)
+        sql = self._insert_sql
 
         batch: list[Sequence[Any]] = []
-        last_flush = time.perf_counter()
+        first_ts = 0.0  # when the oldest row in `batch` was taken off the queue
+        inflight: Optional[asyncio.Task] = None
+        interval = self.flush_interval
 
-        while not (self._stop.is_set() and self._queue.empty()):
-            timeout = self.flush_interval
-            try:
-                item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
-                batch.append([
-                    item["exchange"],
-                    item["market"],
-                    item["symbol"],
-                    item["side"],
-                    item["qty"],
-                    item["price"],
-                    item["notional"],
-                    item["ts_exch_ms"],
-                    item["ts_ingest_ms"],
-                    item["raw"],  # always JSON string now
-                ])
-            except asyncio.TimeoutError:
-                pass
+        buf = sh.buf
+        popleft = buf.popleft
+        has_data = sh.has_data
+        capacity = self.queue_capacity
 
-            now = time.perf_counter()
-            if batch and (len(batch) >= self.batch_size or (now - last_flush) >= self.flush_interval):
+        while not (self._stop.is_set() and not buf):
+            # wait no longer than the oldest pending row's deadline, so no
+            # row sits in `batch` for more than flush_interval
+            timeout = first_ts + interval - time.perf_counter() if batch else interval
+            if timeout > 0 and not buf:
+                has_data.clear()
                 try:
-                    async with self.pool.acquire() as conn:
-                        await conn.executemany(sql, batch)
-                except Exception as e:
-                    print(f"[postgres] insert error ({len(batch)} rows): {e}")
-                finally:
-                    batch.clear()
-                    last_flush = now
+                    await asyncio.wait_for(has_data.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            if buf:
+                if not batch:
+                    first_ts = time.perf_counter()
+                # take everything already queued in this wakeup instead of
+                # one loop round per row; queued items are already records
+                # in column order
+                limit = self.batch_size if inflight is None else capacity
+                while buf and len(batch) < limit:
+                    batch.append(popleft())
+
+            overdue = bool(batch) and time.perf_counter() - first_ts >= interval
+            if inflight is not None:
+                if not inflight.done() and (overdue or len(batch) >= capacity):
+                    # overdue rows go out as soon as the current flush ends; and
+                    # if Postgres is behind, stop pulling so the bounded queue
+                    # (and its drop-oldest) takes the overflow, not `batch`
+                    await inflight
+                if inflight.done():
+                    inflight = None
+
+            if inflight is None and batch and (overdue or len(batch) >= self.batch_size):
+                inflight = asyncio.create_task(self._flush(sh, sql, batch))
+                # wake the loop when this flush ends, so a batch that filled
+                # up meanwhile goes out then rather than at the next row or
+                # deadline
+                inflight.add_done_callback(lambda _t: has_data.set())
+                batch = []
+
+        if inflight is not None:
+            await inflight
 
         # final flush
         if batch:
             try:
-                async with self.pool.acquire() as conn:
-                    await conn.executemany(sql, batch)
-                print(f"[postgres] inserted {len(batch)} rows into {self.table_name}")
+                await self._insert(sh, sql, batch)
+                log.info("[postgres] inserted %d rows into %s", len(batch), self.table_name)
             except Exception as e:
-                print(f"[postgres] final insert error ({len(batch)} rows): {e}")
+                log.error("[postgres] final insert error (%d rows): %s", len(batch), e)
+        await self._release_conn(sh)